@@ -53,6 +53,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'profiles.middleware.QueryBudgetMiddleware',
 ]
 
 ROOT_URLCONF = 'obviously.urls'
@@ -129,6 +130,58 @@ MEDIA_URL = 'media/'
 
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Embedding backend: "sentence-transformers", "hashing" (deterministic n-gram hashing, no model) or a
+# dotted path to a callable taking a list of names and returning one vector per name
+EMBEDDING_BACKEND = "sentence-transformers"
+
+# Vector size of the "hashing" backend
+EMBEDDING_HASHING_DIMENSION = 384
+
+# Embedding model used for name vectors by the sentence-transformers backend
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+
+# Inference runtime: "torch" (fp32), "onnx" or "onnx-int8" (dynamically quantized ONNX)
+EMBEDDING_RUNTIME = "torch"
+
+# Bump when stored name embeddings must be recomputed (part of every NameEmbedding key)
+EMBEDDING_MODEL_VERSION = 1
+
+# Local directory where exported/quantized ONNX models are cached
+EMBEDDING_MODEL_CACHE_DIR = BASE_DIR / "models"
+
+# Target instruction set for int8 quantization: "avx2", "avx512", "avx512_vnni" or "arm64"
+EMBEDDING_QUANTIZATION_CONFIG = "avx2"
+
+# Optional FAISS index compression, applied to stored and query vectors alike.
+# PCA target dimension (None keeps the full model dimension)
+VECTOR_INDEX_PCA_DIM = None
+
+# Vector quantizer: None (float32), "sq8" (1 byte per dimension) or "pq" (product quantization)
+VECTOR_INDEX_QUANTIZER = None
+
+# PQ sub-quantizers, i.e. bytes per stored vector; must divide the (reduced) dimension
+VECTOR_INDEX_PQ_M = 16
+
+# Seconds the change feed trails real time, covering transactions that commit after later ones
+CHANGE_FEED_LAG_SECONDS = 5
+
+# Raise on views exceeding their `query_budgets` (development); otherwise overruns are only logged
+QUERY_BUDGET_ENFORCE = DEBUG
+
+# Name autocomplete index: most distinct names kept in memory, seconds before a background rebuild
+# picks up changes saved by other processes, and most keys a lookup scans (prefixes matching more
+# have their most common names precomputed by the rebuild)
+AUTOCOMPLETE_MAX_NAMES = 500_000
+AUTOCOMPLETE_MAX_AGE = 300
+AUTOCOMPLETE_MAX_SCAN = 1_000
+
+# Calendar days of signups kept as counters for the `stats` endpoint's recent signups window
+PERSON_STATS_SIGNUP_DAYS = 90
+
+# Versioned vector index artifacts written by `manage.py build_vector_index`
+VECTOR_INDEX_DIR = MEDIA_ROOT / "vector_index"
+VECTOR_INDEX_CHECK_INTERVAL = 5  # Seconds between checks of the CURRENT pointer for a new version
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
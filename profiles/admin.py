@@ -1,7 +1,22 @@
-from django.contrib import admin
+import csv
+
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin
+from django.db.models import Q
+from django.http import StreamingHttpResponse
 
+from profiles.choices import Role
 from profiles.models import Person
+from profiles.pagination import EstimatedCountPaginator
+
+# Columns written by the CSV export action
+EXPORT_FIELDS = ("id", "username", "first_name", "last_name", "email", "phone", "date_of_birth", "role", "created_at")
+
+
+class Echo:
+    """File-like object whose write() returns the line, for streaming csv.writer output."""
+    def write(self, value):
+        return value
 
 
 class PersonAdmin(UserAdmin):
@@ -10,12 +25,18 @@ class PersonAdmin(UserAdmin):
     # Fields displayed in the list view
     list_display = ("username", "email", "phone", "date_of_birth", "role", "is_staff", "created_at", "updated_at")
 
-    # Fields used for searching
+    # Fields used for searching (index-backed lookups, see get_search_results)
     search_fields = ("username", "email", "phone", "role")
 
     # Fields used for filtering
     list_filter = ("role", "is_staff", "is_superuser", "is_active")
 
+    # Avoid COUNT(*) over the whole table on every changelist page
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    actions = ["re_embed_persons", "export_persons_csv"]
+
     # How fields are grouped when editing a user
     fieldsets = (
         ("Personal Info", {"fields": ("first_name", "last_name",
@@ -34,6 +55,64 @@ class PersonAdmin(UserAdmin):
 
     readonly_fields = ("created_at", "updated_at")  # Prevent editing these fields manually
 
+    def get_queryset(self, request):
+        """
+        Load only the listed columns on the changelist; the embedding is never joined.
+        """
+        queryset = super().get_queryset(request)
+        if request.resolver_match and request.resolver_match.url_name.endswith("_changelist"):
+            queryset = queryset.only("id", *self.list_display)
+        return queryset
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Match whole terms with exact or prefix lookups that indexes can serve, instead of
+        icontains scans across every search field.
+        """
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+
+        filters = Q(username=search_term) | Q(email=search_term) | Q(email=search_term.lower())
+        filters |= prefix_range("username", search_term) | prefix_range("phone", search_term)
+        if search_term.lower() in Role.values:
+            filters |= Q(role=search_term.lower())
+        return queryset.filter(filters), False
+
+    @admin.action(description="Re-embed selected persons")
+    def re_embed_persons(self, request, queryset):
+        """
+        Link the selected persons to the current model's name embeddings in batches.
+        """
+        updated = queryset.refresh_name_embeddings()
+        self.message_user(request, f"Re-embedded {updated} persons.", messages.SUCCESS)
+
+    @admin.action(description="Export selected persons as CSV")
+    def export_persons_csv(self, request, queryset):
+        """
+        Stream the selected persons as CSV without materialising them as model instances.
+        """
+        writer = csv.writer(Echo())
+        rows = queryset.order_by("id").values_list(*EXPORT_FIELDS).iterator(chunk_size=2000)
+        response = StreamingHttpResponse(
+            (writer.writerow(row) for row in with_header(EXPORT_FIELDS, rows)), content_type="text/csv"
+        )
+        response["Content-Disposition"] = 'attachment; filename="persons.csv"'
+        return response
+
+
+def prefix_range(field, prefix):
+    """
+    Q for `field` starting with `prefix` expressed as a range a B-tree index can serve directly
+    (LIKE 'prefix%' needs a pattern-ops index on PostgreSQL and case-sensitive LIKE on SQLite).
+    """
+    return Q(**{f"{field}__gte": prefix, f"{field}__lt": prefix[:-1] + chr(ord(prefix[-1]) + 1)})
+
+
+def with_header(header, rows):
+    yield header
+    yield from rows
+
 
 # Register the Person model with the custom admin class
 admin.site.register(Person, PersonAdmin)
@@ -0,0 +1,219 @@
+import bisect
+import heapq
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count
+
+from profiles.utils import normalize_name
+
+logger = logging.getLogger(__name__)
+
+MAX_SUGGESTIONS = 50  # Largest `limit` a lookup may ask for
+
+
+def rank(counts, names, limit):
+    """Returns the `limit` most common of `names`, alphabetically among equal counts."""
+    return heapq.nsmallest(limit, names, key=lambda name: (-counts[name], name))
+
+
+def prefix_end(prefix):
+    """Returns the first string sorting after every string that starts with `prefix`."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class NamePrefixIndex:
+    """
+    In-memory sorted index of person names for prefix autocomplete.
+
+    Each distinct name is stored under "first last" and "last first" keys in one sorted list, so a
+    lookup is a binary search plus a scan over the matching keys, ranked by count. Prefixes matching
+    more than settings.AUTOCOMPLETE_MAX_SCAN keys are not scanned: their MAX_SUGGESTIONS most common
+    names are precomputed when the index is built. Memory grows with distinct names (at most
+    settings.AUTOCOMPLETE_MAX_NAMES), not with persons.
+
+    Person save/delete signals keep it current in this process. It is rebuilt from the database on
+    first use, after changes it cannot apply, and every settings.AUTOCOMPLETE_MAX_AGE seconds to pick
+    up changes made by other processes. Aged indexes are rebuilt on a background thread and swapped
+    in, so lookups keep being served from the previous lists meanwhile.
+    """
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.rebuild_lock = threading.Lock()  # Held by the one thread rebuilding
+        self.rebuild_thread = None  # Last background rebuild
+        self.entries = []  # Sorted (key, normalized name) pairs
+        self.counts = Counter()  # Normalized name -> number of persons
+        self.display_names = {}  # Normalized name -> name as first seen
+        self.common_names = {}  # Prefix matching many keys -> its most common normalized names
+        self.built_at = None  # None until built, or after invalidate()
+
+    def suggest(self, prefix, limit=10):
+        """
+        Returns up to `limit` [{"name", "count"}] whose first or last name starts with `prefix`,
+        most common first (alphabetically among equal counts).
+        """
+        prefix = normalize_name(prefix)
+        self.ensure_fresh()
+        with self.lock:
+            if prefix in self.common_names:
+                names = [name for name in self.common_names[prefix] if name in self.counts]
+            else:
+                names = set()
+                position = bisect.bisect_left(self.entries, (prefix,))
+                while position < len(self.entries) and self.entries[position][0].startswith(prefix):
+                    names.add(self.entries[position][1])
+                    position += 1
+            return [
+                {"name": self.display_names[name], "count": self.counts[name]}
+                for name in rank(self.counts, names, limit)
+            ]
+
+    def ensure_fresh(self):
+        """
+        Build a missing index before returning, or start rebuilding an index older than
+        settings.AUTOCOMPLETE_MAX_AGE on a background thread and keep serving it meanwhile.
+        """
+        built_at = self.built_at
+        if built_at is not None:
+            if time.monotonic() - built_at > settings.AUTOCOMPLETE_MAX_AGE and self.rebuild_lock.acquire(False):
+                self.rebuild_thread = threading.Thread(target=self.rebuild_in_background, daemon=True)
+                self.rebuild_thread.start()
+            return
+        with self.rebuild_lock:
+            if self.built_at is None:  # Not built by the thread we waited for
+                self.rebuild()
+
+    def rebuild_in_background(self):
+        try:
+            self.rebuild()
+        except Exception:
+            logger.exception("Rebuilding the name prefix index failed; serving the previous index")
+        finally:
+            connection.close()  # This thread's own connection
+            self.rebuild_lock.release()
+
+    def rebuild(self):
+        """
+        Reload every distinct name from the database, keeping the most common ones up to the limit.
+        """
+        from profiles.models import Person  # Delayed import to prevent circular import issue
+
+        counts = Counter()
+        display_names = {}
+        names = Person.objects.order_by().values_list("first_name", "last_name").annotate(count=Count("id"))
+        for first_name, last_name, count in names.iterator(chunk_size=10000):
+            name = normalize_name(f"{first_name} {last_name}")
+            if name:
+                counts[name] += count
+                display_names.setdefault(name, f"{first_name} {last_name}".strip())
+
+        if len(counts) > settings.AUTOCOMPLETE_MAX_NAMES:
+            counts = Counter(dict(heapq.nlargest(settings.AUTOCOMPLETE_MAX_NAMES, counts.items(), key=lambda c: c[1])))
+        display_names = {name: display_names[name] for name in counts}
+        entries = sorted((key, name) for name in counts for key in self.keys_for(name))
+        common_names = self.find_common_names(entries, counts)
+        with self.lock:  # Swap the new lists in; lookups never see a half-built index
+            self.counts, self.display_names, self.entries = counts, display_names, entries
+            self.common_names = common_names
+            self.built_at = time.monotonic()
+
+    @staticmethod
+    def find_common_names(entries, counts):
+        """
+        Returns {prefix: its MAX_SUGGESTIONS most common names} for every prefix matching more than
+        settings.AUTOCOMPLETE_MAX_SCAN keys of `entries`. Each prefix merges the lists of the prefixes
+        one character longer, so every key is ranked once, in the smallest range containing it.
+        """
+        common_names = {}
+
+        def visit(prefix, start, end):
+            if end - start <= settings.AUTOCOMPLETE_MAX_SCAN:
+                return rank(counts, {name for _, name in entries[start:end]}, MAX_SUGGESTIONS)
+            candidates = set()
+            position = start
+            while position < end and entries[position][0] == prefix:  # Sorted before longer keys
+                candidates.add(entries[position][1])
+                position += 1
+            while position < end:
+                child = entries[position][0][:len(prefix) + 1]
+                child_end = bisect.bisect_left(entries, (prefix_end(child),), position, end)
+                candidates.update(visit(child, position, child_end))
+                position = child_end
+            common_names[prefix] = rank(counts, candidates, MAX_SUGGESTIONS)
+            return common_names[prefix]
+
+        visit("", 0, len(entries))
+        return common_names
+
+    def invalidate(self):
+        """Rebuild on next use, e.g. after bulk writes that send no signals."""
+        with self.lock:
+            self.built_at = None
+
+    def add(self, first_name, last_name):
+        name = normalize_name(f"{first_name} {last_name}")
+        with self.lock:
+            if self.built_at is None or not name:
+                return  # The next rebuild reads it from the database
+            if name not in self.counts:
+                if len(self.counts) >= settings.AUTOCOMPLETE_MAX_NAMES:
+                    return  # Full; picked up by a rebuild if it becomes common
+                self.display_names[name] = f"{first_name} {last_name}".strip()
+                for key in self.keys_for(name):
+                    bisect.insort(self.entries, (key, name))
+            self.counts[name] += 1
+            for key in self.keys_for(name):
+                for end in range(len(key) + 1):
+                    common = self.common_names.get(key[:end])
+                    if common is not None and name not in common:
+                        common.append(name)  # Trimmed back to the most common names once it doubles
+                        if len(common) > 2 * MAX_SUGGESTIONS:
+                            common[:] = rank(self.counts, [n for n in common if n in self.counts], MAX_SUGGESTIONS)
+
+    def remove(self, first_name, last_name):
+        name = normalize_name(f"{first_name} {last_name}")
+        with self.lock:
+            if self.built_at is None or name not in self.counts:
+                return
+            self.counts[name] -= 1
+            if self.counts[name] <= 0:
+                del self.counts[name], self.display_names[name]
+                for key in self.keys_for(name):
+                    position = bisect.bisect_left(self.entries, (key, name))
+                    if position < len(self.entries) and self.entries[position] == (key, name):
+                        del self.entries[position]
+
+    def person_saved(self, person, created):
+        """
+        Apply a Person save; the previous name comes from the values loaded from the database.
+        """
+        name = (person.__dict__.get("first_name"), person.__dict__.get("last_name"))
+        loaded_name = None if created else getattr(person, "_loaded_name", None)
+        if name == loaded_name:
+            return
+        if None in name or (not created and loaded_name is None) or None in (loaded_name or ()):
+            self.invalidate()  # Deferred or unknown names: cannot update incrementally
+            return
+        with self.lock:
+            if loaded_name is not None:
+                self.remove(*loaded_name)
+            self.add(*name)
+
+    def person_deleted(self, person):
+        name = (person.__dict__.get("first_name"), person.__dict__.get("last_name"))
+        if None in name:
+            self.invalidate()
+        else:
+            self.remove(*name)
+
+    @staticmethod
+    def keys_for(name):
+        words = name.split(" ")
+        return {name, " ".join(words[-1:] + words[:-1])}  # "first last" and "last first"
+
+
+NAME_PREFIX_INDEX = NamePrefixIndex()
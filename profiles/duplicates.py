@@ -0,0 +1,137 @@
+import json
+from collections import defaultdict
+
+from django.db import transaction
+
+import faiss
+import numpy as np
+
+from profiles.models import DuplicateCluster, NameEmbedding, Person
+from profiles.utils import build_faiss_index, get_embedding_model_id
+
+
+class UnionFind:
+    """Disjoint sets of person ids, recording the reasons that joined them."""
+    def __init__(self):
+        self.parent = {}
+        self.reasons = defaultdict(set)
+
+    def find(self, item):
+        root = self.parent.setdefault(item, item)
+        while root != self.parent[root]:
+            root = self.parent[root]
+        while item != root:  # Path compression
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, items, reason):
+        items = iter(items)
+        root = self.find(next(items))
+        for item in items:
+            other = self.find(item)
+            if other != root:
+                self.parent[other] = root
+                self.reasons[root] |= self.reasons.pop(other, set())
+        self.reasons[root].add(reason)
+
+    def clusters(self):
+        """Returns [(person ids, reasons)] for every set with more than one person."""
+        members = defaultdict(list)
+        for item in self.parent:
+            members[self.find(item)].append(item)
+        return [(sorted(ids), sorted(self.reasons[root])) for root, ids in members.items() if len(ids) > 1]
+
+
+def find_similar_name_pairs(threshold, k=10, batch_size=4096, threads=None):
+    """
+    Returns (embedding ids, [(i, j)]) for pairs of stored name vectors within squared L2 distance
+    `threshold`, searched in batches over one index of the distinct names persons use.
+
+    Persons with the same name share a vector, so the matrix holds each name once and identical
+    names never crowd other near neighbours out of the k results.
+    """
+    embeddings = NameEmbedding.objects.with_vectors().filter(
+        model_name=get_embedding_model_id(), id__in=Person.objects.values("name_embedding_id")
+    )
+    names = list(embeddings.order_by("id").values_list("id", "vector"))
+    embedding_ids = [embedding_id for embedding_id, _ in names]
+    if len(names) < 2:
+        return embedding_ids, []
+
+    matrix = np.array([json.loads(vector) for _, vector in names], dtype="float32")
+    faiss.normalize_L2(matrix)  # Thresholds are distances between unit vectors, as in vector search
+    index = build_faiss_index(matrix, "Flat")
+    if threads:
+        faiss.omp_set_num_threads(threads)  # FAISS searches each batch across cores with OpenMP
+
+    k = min(k + 1, len(names))  # One hit is the name itself
+    pairs = set()
+    for start in range(0, len(matrix), batch_size):
+        distances, indices = index.search(matrix[start:start + batch_size], k)
+        queries = np.arange(start, start + len(indices))[:, None]
+        hits, columns = np.nonzero((distances <= threshold) & (indices >= 0) & (indices != queries))
+        for i, j in zip((hits + start).tolist(), indices[hits, columns].tolist()):
+            pairs.add((min(i, j), max(i, j)))  # Neighbour lists are not symmetric
+    return embedding_ids, sorted(pairs)
+
+
+def find_duplicate_clusters(threshold=0.2, k=10, batch_size=4096, threads=None):
+    """
+    Group persons that likely describe the same person:
+
+    * "name": the same or a similar name (vector distance <= threshold) and the same date of birth
+    * "email": the same email, ignoring case
+    * "phone": the same phone digits
+
+    Returns [(person ids, reasons)] with one entry per connected group.
+    """
+    embedding_ids, name_pairs = find_similar_name_pairs(threshold, k, batch_size, threads)
+
+    by_name = defaultdict(lambda: defaultdict(list))  # name embedding id -> date of birth -> person ids
+    by_email = defaultdict(list)
+    by_phone = defaultdict(list)
+    persons = Person.objects.values_list("id", "name_embedding_id", "date_of_birth", "email", "phone")
+    for person_id, embedding_id, date_of_birth, email, phone in persons.iterator(chunk_size=10000):
+        if embedding_id is not None:
+            by_name[embedding_id][date_of_birth].append(person_id)
+        if email.strip():
+            by_email[email.strip().casefold()].append(person_id)
+        digits = "".join(char for char in phone if char.isdigit())
+        if digits:
+            by_phone[digits].append(person_id)
+
+    groups = UnionFind()
+    for births in by_name.values():
+        for person_ids in births.values():
+            if len(person_ids) > 1:
+                groups.union(person_ids, "name")
+    for i, j in name_pairs:
+        first, second = by_name[embedding_ids[i]], by_name[embedding_ids[j]]
+        for date_of_birth in first.keys() & second.keys():
+            groups.union(first[date_of_birth] + second[date_of_birth], "name")
+    for reason, collisions in (("email", by_email), ("phone", by_phone)):
+        for person_ids in collisions.values():
+            if len(person_ids) > 1:
+                groups.union(person_ids, reason)
+    return groups.clusters()
+
+
+@transaction.atomic
+def store_duplicate_clusters(clusters, batch_size=2000):
+    """
+    Replace the stored DuplicateCluster rows with `clusters` ([(person ids, reasons)]).
+    """
+    DuplicateCluster.objects.all().delete()
+    stored = DuplicateCluster.objects.bulk_create(
+        [DuplicateCluster(reasons=reasons) for _, reasons in clusters], batch_size=batch_size
+    )
+    Membership = DuplicateCluster.persons.through
+    Membership.objects.bulk_create(
+        [
+            Membership(duplicatecluster_id=cluster.id, person_id=person_id)
+            for cluster, (person_ids, _) in zip(stored, clusters)
+            for person_id in person_ids
+        ],
+        batch_size=batch_size,
+    )
+    return stored
@@ -0,0 +1,100 @@
+import zlib
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+import numpy as np
+
+
+class SentenceTransformerBackend:
+    """
+    Encodes with settings.EMBEDDING_MODEL_NAME on the configured EMBEDDING_RUNTIME.
+    """
+    batch_size = 64
+
+    @property
+    def model_id(self):
+        return f"{settings.EMBEDDING_MODEL_NAME}:{settings.EMBEDDING_RUNTIME}:v{settings.EMBEDDING_MODEL_VERSION}"
+
+    def encode_many(self, names):
+        from profiles.utils import load_embedding_model  # Delayed import to prevent circular import issue
+
+        model = load_embedding_model(settings.EMBEDDING_RUNTIME)
+        return np.asarray(model.encode(list(names), batch_size=self.batch_size), dtype="float32")
+
+
+class HashingBackend:
+    """
+    Deterministic character n-gram embedder without a model, for tests and load environments.
+
+    Each word contributes the signed hashes of its 2- and 3-grams (anchored at the word start, so
+    prefixes like "Nii" stay close to "Niiv"); word vectors are normalized, summed and normalized again.
+    """
+    ngram_sizes = (2, 3)
+
+    def __init__(self, dimension):
+        self.dimension = dimension
+
+    @property
+    def model_id(self):
+        return f"hashing-{self.dimension}:v{settings.EMBEDDING_MODEL_VERSION}"
+
+    def encode_many(self, names):
+        names = list(names)
+        vectors = np.zeros((len(names), self.dimension), dtype="float32")
+        for row, name in enumerate(names):
+            for word in name.split():
+                word = f" {word}"
+                word_vector = np.zeros(self.dimension, dtype="float32")
+                for size in self.ngram_sizes:
+                    for start in range(len(word) - size + 1):
+                        code = zlib.crc32(word[start:start + size].encode())
+                        word_vector[code % self.dimension] += 1 if (code // self.dimension) % 2 else -1
+                norm = np.linalg.norm(word_vector)
+                if norm:
+                    vectors[row] += word_vector / norm
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+
+class CallableBackend:
+    """
+    Wraps a user-supplied callable taking a list of names and returning one vector per name.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.encoder = import_string(path)
+
+    @property
+    def model_id(self):
+        return f"{self.path}:v{settings.EMBEDDING_MODEL_VERSION}"
+
+    def encode_many(self, names):
+        return np.asarray(self.encoder(list(names)), dtype="float32")
+
+
+# Built-in backends selectable through settings.EMBEDDING_BACKEND; any other value is a dotted path
+EMBEDDING_BACKENDS = {
+    "sentence-transformers": SentenceTransformerBackend,
+    "hashing": lambda: HashingBackend(settings.EMBEDDING_HASHING_DIMENSION),
+}
+
+
+@lru_cache(maxsize=None)
+def get_embedding_backend():
+    """
+    Returns the configured embedding backend, created once per process (cleared when an
+    EMBEDDING_* setting changes, see profiles.signals).
+    """
+    backend = settings.EMBEDDING_BACKEND
+    if backend in EMBEDDING_BACKENDS:
+        return EMBEDDING_BACKENDS[backend]()
+    try:
+        return CallableBackend(backend)
+    except ImportError as exc:
+        raise ImproperlyConfigured(
+            f"EMBEDDING_BACKEND must be one of {', '.join(EMBEDDING_BACKENDS)} or a dotted path to a callable, "
+            f"got {backend!r}."
+        ) from exc
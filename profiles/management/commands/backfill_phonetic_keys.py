@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from profiles.models import Person
+from profiles.utils import soundex
+
+
+class Command(BaseCommand):
+    help = "Compute first/last name phonetic keys for existing persons."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=2000, help="Rows updated per bulk_update call.")
+        parser.add_argument("--all", action="store_true", help="Recompute every row, not only rows without keys.")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        if batch_size < 1:
+            raise CommandError("--batch-size must be a positive integer.")
+
+        persons = Person.objects.order_by("id").only(
+            "id", "first_name", "last_name", "first_name_phonetic", "last_name_phonetic"
+        )
+        if not options["all"]:
+            persons = persons.filter(first_name_phonetic="", last_name_phonetic="")
+
+        updated = 0
+        last_id = 0
+        while True:
+            batch = list(persons.filter(id__gt=last_id)[:batch_size])  # Keyset pages stay fast on large tables
+            if not batch:
+                break
+            changed = []
+            for person in batch:
+                keys = (soundex(person.first_name), soundex(person.last_name))
+                if keys != (person.first_name_phonetic, person.last_name_phonetic):
+                    person.first_name_phonetic, person.last_name_phonetic = keys
+                    changed.append(person)
+            with transaction.atomic():
+                Person.objects.bulk_update(changed, ["first_name_phonetic", "last_name_phonetic"])
+            updated += len(changed)
+            last_id = batch[-1].id
+
+        self.stdout.write(self.style.SUCCESS(f"Updated phonetic keys of {updated} persons"))
@@ -0,0 +1,75 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+import numpy as np
+
+from profiles.management.commands.seed_persons import FIRST_NAMES, LAST_NAMES
+from profiles.models import Person
+from profiles.utils import EMBEDDING_RUNTIMES, load_embedding_model
+
+
+class Command(BaseCommand):
+    help = "Compare encode latency, throughput and cosine agreement of the embedding runtimes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--runtimes",
+            nargs="+",
+            choices=EMBEDDING_RUNTIMES,
+            default=list(EMBEDDING_RUNTIMES),
+            help="Runtimes to benchmark; 'torch' is always included as the fp32 baseline.",
+        )
+        parser.add_argument("--samples", type=int, default=1000, help="Number of names to encode.")
+        parser.add_argument("--batch-size", type=int, default=64, help="Batch size for the throughput run.")
+        parser.add_argument("--latency-runs", type=int, default=200, help="Single-name encodes timed per runtime.")
+
+    def handle(self, *args, **options):
+        if options["samples"] < 1 or options["latency_runs"] < 1:
+            raise CommandError("--samples and --latency-runs must be positive integers.")
+
+        names = self.sample_names(options["samples"])
+        runtimes = ["torch"] + [runtime for runtime in options["runtimes"] if runtime != "torch"]
+
+        baseline = None
+        self.stdout.write(
+            f"{'runtime':<10} {'p50 ms':>8} {'p95 ms':>8} {'names/s':>10} {'cos mean':>9} {'cos min':>9}"
+        )
+        for runtime in runtimes:
+            model = load_embedding_model(runtime)
+            model.encode(names[:8])  # Warm up before timing
+
+            latencies = []
+            for name in names[:options["latency_runs"]]:
+                started = time.perf_counter()
+                model.encode(name)
+                latencies.append((time.perf_counter() - started) * 1000)
+
+            started = time.perf_counter()
+            vectors = model.encode(names, batch_size=options["batch_size"], normalize_embeddings=True)
+            throughput = len(names) / (time.perf_counter() - started)
+
+            if baseline is None:
+                baseline = vectors
+            cosine = np.sum(vectors * baseline, axis=1)  # Rows are unit length
+
+            self.stdout.write(
+                f"{runtime:<10} {np.percentile(latencies, 50):>8.2f} {np.percentile(latencies, 95):>8.2f} "
+                f"{throughput:>10.0f} {cosine.mean():>9.4f} {cosine.min():>9.4f}"
+            )
+
+    def sample_names(self, samples):
+        """
+        Use stored person names when available, otherwise synthetic combinations.
+        """
+        names = [
+            f"{first} {last}".strip()
+            for first, last in Person.objects.values_list("first_name", "last_name")[:samples]
+        ]
+        index = 0
+        while len(names) < samples:
+            first = FIRST_NAMES[index % len(FIRST_NAMES)]
+            last = LAST_NAMES[index // len(FIRST_NAMES) % len(LAST_NAMES)]
+            names.append(f"{first} {last}")
+            index += 1
+        return names
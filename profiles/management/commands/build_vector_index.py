@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from profiles.vector_index import build_vector_index
+
+
+class Command(BaseCommand):
+    help = "Build a new vector index version from stored embeddings and atomically make it the active one."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--keep", type=int, default=3, help="Number of most recent versions kept on disk.")
+
+    def handle(self, *args, **options):
+        if options["keep"] < 1:
+            raise CommandError("--keep must be a positive integer.")
+
+        manifest = build_vector_index(keep=options["keep"])
+        if manifest is None:
+            raise CommandError("No persons with embeddings found.")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Published vector index {manifest['version']} ({manifest['row_count']} vectors, {manifest['factory']})"
+        ))
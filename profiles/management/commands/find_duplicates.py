@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from profiles.duplicates import find_duplicate_clusters, store_duplicate_clusters
+
+
+class Command(BaseCommand):
+    help = "Find likely duplicate persons (similar name and birth date, same email or phone) and store the clusters."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--threshold", type=float, default=0.2, help="Maximum squared L2 distance between similar names."
+        )
+        parser.add_argument("--k", type=int, default=10, help="Nearest names compared per name.")
+        parser.add_argument("--batch-size", type=int, default=4096, help="Names searched per FAISS call.")
+        parser.add_argument("--threads", type=int, default=None, help="FAISS search threads (default: all cores).")
+
+    def handle(self, *args, **options):
+        if options["k"] < 1 or options["batch_size"] < 1 or options["threshold"] < 0:
+            raise CommandError("--k and --batch-size must be positive and --threshold non-negative.")
+
+        started = time.perf_counter()
+        clusters = find_duplicate_clusters(
+            threshold=options["threshold"],
+            k=options["k"],
+            batch_size=options["batch_size"],
+            threads=options["threads"],
+        )
+        store_duplicate_clusters(clusters)
+
+        persons = sum(len(person_ids) for person_ids, _ in clusters)
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {len(clusters)} duplicate clusters covering {persons} persons "
+            f"in {time.perf_counter() - started:.2f}s"
+        ))
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from profiles.models import Person
+
+
+class Command(BaseCommand):
+    help = (
+        "Link every person to the configured EMBEDDING_BACKEND's name embedding, encoding names not stored yet "
+        "(run after changing the backend or EMBEDDING_MODEL_VERSION)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=2000, help="Persons linked per batch.")
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be a positive integer.")
+
+        started = time.perf_counter()
+        updated = Person.objects.refresh_name_embeddings(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Re-embedded {updated} persons in {time.perf_counter() - started:.2f}s"
+        ))
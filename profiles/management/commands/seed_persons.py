@@ -0,0 +1,221 @@
+import re
+import time
+import zlib
+from collections import Counter
+from datetime import date, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, connection, transaction
+from django.db.models.functions import Length
+from django.utils import timezone
+
+import numpy as np
+
+from profiles.choices import Role
+from profiles.models import NameEmbedding, Person
+from profiles.stats import apply_counter_deltas, counter_names
+from profiles.utils import normalize_name, soundex
+
+FIRST_NAMES = [
+    "James", "Mary", "John", "Patricia", "Robert", "Jennifer", "Michael", "Linda", "William", "Elizabeth",
+    "David", "Barbara", "Richard", "Susan", "Joseph", "Jessica", "Thomas", "Sarah", "Charles", "Karen",
+    "Christopher", "Nancy", "Daniel", "Lisa", "Matthew", "Betty", "Anthony", "Margaret", "Mark", "Sandra",
+    "Donald", "Ashley", "Steven", "Kimberly", "Paul", "Emily", "Andrew", "Donna", "Joshua", "Michelle",
+    "Kenneth", "Carol", "Kevin", "Amanda", "Brian", "Dorothy", "George", "Melissa", "Timothy", "Deborah",
+    "Priya", "Rahul", "Ananya", "Arjun", "Mei", "Wei", "Yuki", "Hiroshi", "Fatima", "Omar",
+    "Sofia", "Mateo", "Lucia", "Diego", "Amara", "Kwame", "Olga", "Ivan", "Ingrid", "Lars",
+]
+
+LAST_NAMES = [
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez",
+    "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson", "Thomas", "Taylor", "Moore", "Jackson", "Martin",
+    "Lee", "Perez", "Thompson", "White", "Harris", "Sanchez", "Clark", "Ramirez", "Lewis", "Robinson",
+    "Walker", "Young", "Allen", "King", "Wright", "Scott", "Torres", "Nguyen", "Hill", "Flores",
+    "Sharma", "Patel", "Singh", "Kumar", "Chen", "Wang", "Tanaka", "Sato", "Khan", "Ali",
+    "Silva", "Santos", "Okafor", "Mensah", "Ivanov", "Petrov", "Larsen", "Hansen", "Muller", "Schmidt",
+]
+
+MIN_DATE_OF_BIRTH = date(1901, 1, 1)  # Lower bound enforced by validate_date_of_birth
+MAX_DATE_OF_BIRTH = date(2024, 12, 31)  # Fixed, so a seed yields the same dates whatever the day it runs
+ADMIN_RATIO = 0.02  # Share of generated persons that get the admin role
+
+# Person fields filled per row by build_batch(), in this order; every other column gets one shared value
+GENERATED_FIELDS = (
+    "username", "email", "first_name", "last_name", "first_name_phonetic", "last_name_phonetic", "phone",
+    "date_of_birth", "role", "name_embedding",
+)
+
+
+class Command(BaseCommand):
+    help = "Bulk-generate synthetic Person rows for load and scale testing."
+
+    def add_arguments(self, parser):
+        parser.add_argument("count", type=int, help="Number of persons to create.")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed; the same seed yields the same rows.")
+        parser.add_argument("--batch-size", type=int, default=20000, help="Rows inserted per transaction.")
+        parser.add_argument(
+            "--offset", type=int, default=None,
+            help="First username index (default: after the highest index already used with the prefix).",
+        )
+        parser.add_argument("--username-prefix", default="seed", help="Prefix for generated usernames.")
+        parser.add_argument("--password", default="password", help="Password shared by every generated person.")
+        parser.add_argument(
+            "--embeddings",
+            choices=["fake", "model"],
+            default="fake",
+            help=(
+                "'fake' derives a deterministic unit vector from the name (stored under its own model id, so "
+                "it is not used by vector search), 'model' batch-encodes with the configured EMBEDDING_BACKEND."
+            ),
+        )
+        parser.add_argument("--dimension", type=int, default=384, help="Vector size used by fake embeddings.")
+
+    def handle(self, *args, **options):
+        count = options["count"]
+        batch_size = options["batch_size"]
+        if count < 1 or batch_size < 1:
+            raise CommandError("count and --batch-size must be positive integers.")
+
+        rng = np.random.default_rng(options["seed"])
+        offset = options["offset"]
+        if offset is None:
+            offset = self.next_free_offset(options["username_prefix"])
+        self.embedding_cache = {}  # normalized full name -> NameEmbedding id; names repeat heavily
+        self.name_values = {}  # (first, last) name indexes -> name columns of the row
+
+        started = time.perf_counter()
+        timestamp = timezone.now()  # created_at, updated_at and date_joined of every row
+        columns, shared_values = self.insert_columns(timestamp, make_password(options["password"]))
+        if connection.vendor == "sqlite":
+            with connection.cursor() as cursor:
+                cursor.execute("PRAGMA cache_size = -131072")  # 128 MB, keeps the index pages being filled cached
+        created = 0
+        while created < count:
+            size = min(batch_size, count - created)
+            rows, counters = self.build_batch(rng, size, offset + created, timestamp, options)
+            try:
+                with transaction.atomic(), connection.cursor() as cursor:
+                    self.insert_rows(cursor, columns, [row + shared_values for row in rows])
+                    apply_counter_deltas(counters)  # Raw inserts send no signals
+            except IntegrityError as exc:
+                raise CommandError(
+                    f"Could not insert persons from username {options['username_prefix']}{offset + created}: {exc}. "
+                    "Omit --offset to continue after the existing usernames."
+                ) from exc
+            created += size
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {created} persons in {elapsed:.2f}s ({created / max(elapsed, 1e-9):,.0f} rows/sec)"
+        ))
+
+    def next_free_offset(self, prefix):
+        """
+        Returns one past the highest numeric username suffix already used with `prefix`.
+        """
+        last = Person.objects.filter(username__regex=rf"^{re.escape(prefix)}[0-9]+$").order_by(
+            Length("username").desc(), "-username"
+        ).values_list("username", flat=True).first()
+        return int(last[len(prefix):]) + 1 if last else 0
+
+    def insert_columns(self, timestamp, password):
+        """
+        Returns the quoted column list of the generated rows, and the database values of the columns
+        every row shares (appended after the GENERATED_FIELDS values).
+        """
+        generated = [Person._meta.get_field(name) for name in GENERATED_FIELDS]
+        shared = [field for field in Person._meta.concrete_fields if not field.primary_key and field not in generated]
+        shared_values = []
+        for field in shared:
+            if field.name == "password":
+                value = password  # Hashed once, every row shares it
+            elif field.name in ("created_at", "updated_at", "date_joined"):
+                value = timestamp
+            else:
+                value = field.get_default()
+            shared_values.append(field.get_db_prep_save(value, connection))
+
+        columns = ", ".join(connection.ops.quote_name(field.column) for field in generated + shared)
+        return columns, tuple(shared_values)
+
+    def insert_rows(self, cursor, columns, rows):
+        """
+        Insert prepared rows, bypassing model instances: COPY on PostgreSQL, executemany elsewhere.
+        """
+        table = connection.ops.quote_name(Person._meta.db_table)
+        if connection.vendor == "postgresql":
+            with cursor.copy(f"COPY {table} ({columns}) FROM STDIN") as copy:  # psycopg 3
+                for row in rows:
+                    copy.write_row(row)
+        else:
+            placeholders = ", ".join(["%s"] * len(rows[0]))
+            cursor.executemany(f"INSERT INTO {table} ({columns}) VALUES ({placeholders})", rows)
+
+    def build_batch(self, rng, size, start, timestamp, options):
+        """
+        Build `size` rows of GENERATED_FIELDS values ready for the database, and the statistics counter
+        deltas for them. Random columns are drawn as whole arrays per batch.
+        """
+        first_names = rng.integers(len(FIRST_NAMES), size=size).tolist()
+        last_names = rng.integers(len(LAST_NAMES), size=size).tolist()
+        span = (MAX_DATE_OF_BIRTH - MIN_DATE_OF_BIRTH).days
+        birth_offsets = rng.integers(span + 1, size=size).tolist()
+        birth_dates = [MIN_DATE_OF_BIRTH + timedelta(days=offset) for offset in birth_offsets]
+        roles = [(Role.GUEST.value, Role.ADMIN.value)[admin] for admin in (rng.random(size) < ADMIN_RATIO).tolist()]
+        phones = rng.integers(10 ** 9, 10 ** 10, size=size).tolist()
+
+        # Values derived from the name are computed once per (first, last) pair
+        pairs = set(zip(first_names, last_names)).difference(self.name_values)
+        self.cache_embeddings([f"{FIRST_NAMES[f]} {LAST_NAMES[l]}" for f, l in pairs], options)
+        self.name_values.update(
+            ((f, l), (
+                FIRST_NAMES[f], LAST_NAMES[l], soundex(FIRST_NAMES[f]), soundex(LAST_NAMES[l]),
+                self.embedding_cache[normalize_name(f"{FIRST_NAMES[f]} {LAST_NAMES[l]}")],
+            ))
+            for f, l in pairs
+        )
+
+        adapt_date = connection.ops.adapt_datefield_value
+        prefix = options["username_prefix"]
+        rows = []
+        for i, pair in enumerate(zip(first_names, last_names)):
+            username = f"{prefix}{start + i}"
+            first_name, last_name, first_phonetic, last_phonetic, embedding_id = self.name_values[pair]
+            rows.append((
+                username, f"{username}@example.com", first_name, last_name, first_phonetic, last_phonetic,
+                str(phones[i]), adapt_date(birth_dates[i]), roles[i], embedding_id,
+            ))
+        counters = Counter(
+            name for role, date_of_birth in zip(roles, birth_dates) for name in counter_names(role, date_of_birth)
+        )
+        # Every row shares the signup day, so count it once for the batch
+        counters.update({name: size for name in counter_names(None, None, timestamp) if name != "total"})
+        return rows, counters
+
+    def cache_embeddings(self, full_names, options):
+        """
+        Look up or store shared embeddings for names not seen in earlier batches.
+        """
+        missing = sorted({normalize_name(name) for name in full_names}.difference(self.embedding_cache))
+        if not missing:
+            return
+
+        if options["embeddings"] == "model":
+            embeddings = NameEmbedding.objects.for_names(missing)
+        else:
+            dimension = options["dimension"]
+            embeddings = NameEmbedding.objects.for_names(
+                missing,
+                encoder=lambda names: [fake_embedding(name, dimension) for name in names],
+                model_id=f"seed-fake-{dimension}",
+            )
+        self.embedding_cache.update((name, embedding.id) for name, embedding in embeddings.items())
+
+
+def fake_embedding(name, dimension):
+    """
+    Deterministic unit vector for `name`, so identical names always get identical embeddings.
+    """
+    vector = np.random.default_rng(zlib.crc32(name.encode())).standard_normal(dimension)
+    return vector / np.linalg.norm(vector)
@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand, CommandError
+
+import faiss
+import numpy as np
+
+from profiles.utils import build_faiss_index, get_index_factory_string, load_person_embeddings
+
+
+class Command(BaseCommand):
+    help = "Report memory savings and recall loss of compressed vector indexes against exact search."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--pca-dim", type=int, nargs="*", default=[None], help="PCA dimensions to try; 0 keeps the full dimension."
+        )
+        parser.add_argument(
+            "--quantizer", nargs="*", default=[None, "sq8", "pq"], help="Quantizers to try: none, sq8, pq."
+        )
+        parser.add_argument("--pq-m", type=int, default=16, help="PQ sub-quantizers (bytes per vector).")
+        parser.add_argument("--queries", type=int, default=500, help="Stored vectors reused as queries.")
+        parser.add_argument("--k", type=int, default=10, help="Neighbours compared for recall@k.")
+        parser.add_argument("--seed", type=int, default=0, help="Seed for picking query vectors.")
+
+    def handle(self, *args, **options):
+        person_ids, embeddings = load_person_embeddings()
+        if not person_ids:
+            raise CommandError("No persons with embeddings found.")
+
+        k = min(options["k"], len(person_ids))
+        rng = np.random.default_rng(options["seed"])
+        sample = rng.choice(len(embeddings), size=min(options["queries"], len(embeddings)), replace=False)
+        queries = embeddings[sample]
+
+        exact = build_faiss_index(embeddings, "Flat")
+        exact_bytes = len(faiss.serialize_index(exact))
+        _, expected = exact.search(queries, k)
+
+        self.stdout.write(
+            f"{len(person_ids)} vectors of dimension {embeddings.shape[1]}, recall@{k} over {len(queries)} queries"
+        )
+        self.stdout.write(f"{'index':<20} {'MiB':>9} {'saving':>8} {'recall':>8}")
+        self.stdout.write(f"{'Flat':<20} {exact_bytes / 2 ** 20:>9.2f} {'-':>8} {1:>8.4f}")
+
+        for pca_dim in options["pca_dim"]:
+            for quantizer in options["quantizer"]:
+                quantizer = None if quantizer in (None, "none") else quantizer
+                factory_string = get_index_factory_string(
+                    embeddings.shape[1], len(embeddings), pca_dim=pca_dim, quantizer=quantizer, pq_m=options["pq_m"]
+                )
+                if factory_string == "Flat":
+                    continue  # Baseline already reported, or too few vectors to train this variant
+
+                index = build_faiss_index(embeddings, factory_string)
+                index_bytes = len(faiss.serialize_index(index))
+                _, found = index.search(queries, k)
+                recall = np.mean([len(set(f) & set(e)) / k for f, e in zip(found, expected)])
+                self.stdout.write(
+                    f"{factory_string:<20} {index_bytes / 2 ** 20:>9.2f} "
+                    f"{1 - index_bytes / exact_bytes:>8.1%} {recall:>8.4f}"
+                )
@@ -1,8 +1,98 @@
+import json
+from datetime import date, timedelta
+
 from django.contrib.auth.models import BaseUserManager
+from django.db import models
+from django.db.models import Case, ExpressionWrapper, IntegerField, Q, Value, When
+from django.db.models.functions import ExtractYear
 from django.utils.timezone import now
 
+import numpy as np
+
+from profiles.choices import Role
+from profiles.utils import encode_names, get_embedding_model_id, get_name_embedding_key, normalize_name
+
+
+def years_before(day, years):
+    """Returns the date `years` before `day`; Feb 29 falls back to Feb 28 in non-leap years."""
+    try:
+        return day.replace(year=day.year - years)
+    except ValueError:
+        return day.replace(year=day.year - years, day=28)
+
+
+class PersonQuerySet(models.QuerySet):
+    """
+    Custom queryset for Person with database-side age helpers.
+    """
+    def with_age(self, today=None):
+        """
+        Annotate `age` in whole years, computed by the database from date_of_birth.
+        """
+        today = today or date.today()
+        had_birthday = Q(date_of_birth__month__lt=today.month) | Q(
+            date_of_birth__month=today.month, date_of_birth__day__lte=today.day
+        )
+        return self.annotate(age=ExpressionWrapper(
+            Value(today.year) - ExtractYear("date_of_birth") - Case(When(had_birthday, then=0), default=1),
+            output_field=IntegerField(),
+        ))
+
+    def filter_by_age(self, age_min=None, age_max=None, today=None):
+        """
+        Keep persons aged between `age_min` and `age_max` (inclusive), as a date_of_birth range so the
+        index on date_of_birth is used.
+        """
+        today = today or date.today()
+        queryset = self
+        if age_min is not None:
+            queryset = queryset.filter(date_of_birth__lte=years_before(today, age_min))
+        if age_max is not None:
+            queryset = queryset.filter(date_of_birth__gt=years_before(today, age_max + 1))
+        return queryset
+
+    def order_by_age(self, descending=False):
+        """
+        Order by age through the date_of_birth index (younger persons have later birth dates).
+        """
+        return self.order_by("date_of_birth", "id") if descending else self.order_by("-date_of_birth", "id")
+
+    def with_embeddings(self):
+        """
+        Join each person's name embedding including its vector, for vector workloads only;
+        other Person queries never read the vector text.
+        """
+        return self.select_related("name_embedding")
+
+    def refresh_name_embeddings(self, batch_size=2000):
+        """
+        Link every person in the queryset to the current model's shared name embedding, encoding
+        missing names once per batch instead of once per person. Returns the number of persons updated.
+        """
+        from profiles.models import NameEmbedding  # Delayed import to prevent circular import issue
+
+        updated = 0
+        last_id = 0
+        persons = self.only("id", "first_name", "last_name", "name_embedding_id").order_by("id")
+        while batch := list(persons.filter(id__gt=last_id)[:batch_size]):  # Keyset pages, safe to write between
+            updated += self._link_name_embeddings(NameEmbedding, batch)
+            last_id = batch[-1].id
+        return updated
+
+    def _link_name_embeddings(self, name_embedding_model, persons):
+        full_names = {person.id: f"{person.first_name} {person.last_name}".strip() for person in persons}
+        embeddings = name_embedding_model.objects.for_names(full_names.values())
+        changed = []
+        for person in persons:
+            embedding = embeddings[normalize_name(full_names[person.id])]
+            if person.name_embedding_id != embedding.id:
+                person.name_embedding_id = embedding.id
+                changed.append(person)
+        self.model.objects.bulk_update(changed, ["name_embedding"])
+        return len(changed)
+
 
-class PersonManager(BaseUserManager):
+class PersonManager(BaseUserManager.from_queryset(PersonQuerySet)):
     """
     Custom manager for the Person model to add additional query methods.
     """
@@ -30,3 +120,60 @@ class PersonManager(BaseUserManager):
         """Retrieve users created within the last `days`."""
         time_threshold = now() - timedelta(days=days)
         return self.filter(created_at__gte=time_threshold)
+
+
+class NameEmbeddingQuerySet(models.QuerySet):
+    """
+    Custom queryset for NameEmbedding; the vector text is deferred unless explicitly requested.
+    """
+    def with_vectors(self):
+        """
+        Load the stored vectors as well, for vector search and index builds.
+        """
+        return self.defer(None)
+
+
+class NameEmbeddingManager(models.Manager.from_queryset(NameEmbeddingQuerySet)):
+    """
+    Custom manager for NameEmbedding to share one stored vector between persons with the same name.
+    """
+    lookup_batch_size = 500  # Keys per IN (...) query, well below SQLite's parameter limit
+
+    def get_queryset(self):
+        """
+        Defer the multi-kilobyte vector text; see NameEmbeddingQuerySet.with_vectors.
+        """
+        return super().get_queryset().defer("vector")
+
+    def for_names(self, names, encoder=None, model_id=None):
+        """
+        Return {normalized name: NameEmbedding} for `names`.
+
+        Only names without a stored vector for `model_id` (the configured model by default) are
+        encoded, in a single `encoder` call (`encode_names` by default).
+        """
+        model_id = model_id or get_embedding_model_id()
+        names_by_key = {
+            get_name_embedding_key(name, model_id): name for name in {normalize_name(name) for name in names}
+        }
+
+        found = self._get_by_keys(names_by_key)
+        missing = [key for key in names_by_key if key not in found]
+        if missing:
+            vectors = (encoder or encode_names)([names_by_key[key] for key in missing])
+            embeddings = [
+                self.model(key=key, model_name=model_id, vector=json.dumps(np.asarray(vector, "float32").tolist()))
+                for key, vector in zip(missing, vectors)
+            ]
+            self.bulk_create(embeddings, ignore_conflicts=True)  # Another process may have stored a name meanwhile
+            found.update(self._get_by_keys(missing))
+
+        return {names_by_key[key]: embedding for key, embedding in found.items()}
+
+    def _get_by_keys(self, keys):
+        keys = list(keys)
+        found = {}
+        for start in range(0, len(keys), self.lookup_batch_size):
+            for embedding in self.filter(key__in=keys[start:start + self.lookup_batch_size]):
+                found[embedding.key] = embedding
+        return found
@@ -0,0 +1,117 @@
+import logging
+from contextvars import ContextVar
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+# Usage counters of the request being served in the current thread/task, if any
+CURRENT_USAGE = ContextVar("query_budget_usage", default=None)
+
+
+class QueryBudget(NamedTuple):
+    """Maximum queries and fetched database rows for one request; None leaves a limit open."""
+    queries: Optional[int]
+    rows: Optional[int] = None
+
+
+class QueryBudgetExceeded(Exception):
+    """Raised when a request exceeds its view's query budget while enforcement is on."""
+
+
+class QueryUsage:
+    """
+    Queries executed and rows fetched while serving one request.
+
+    Installed as a database execute wrapper: it counts each query and makes the cursor count the rows
+    returned by fetchone/fetchmany/fetchall, which covers model instances and values()/values_list()
+    reads alike. Rows read by iterating a raw cursor directly are not counted.
+    """
+    def __init__(self):
+        self.queries = 0
+        self.rows = 0
+        self.view_name = None
+        self.budget = None
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries += 1
+        self.count_fetched_rows(context["cursor"])
+        return execute(sql, params, many, context)
+
+    def count_fetched_rows(self, cursor):
+        if "fetchmany" in vars(cursor):
+            return  # Already counting for this cursor
+        fetchone, fetchmany, fetchall = cursor.fetchone, cursor.fetchmany, cursor.fetchall
+
+        def counted_fetchone():
+            row = fetchone()
+            self.rows += row is not None
+            return row
+
+        def counted_fetchmany(*args, **kwargs):
+            rows = fetchmany(*args, **kwargs)
+            self.rows += len(rows)
+            return rows
+
+        def counted_fetchall():
+            rows = fetchall()
+            self.rows += len(rows)
+            return rows
+
+        cursor.fetchone, cursor.fetchmany, cursor.fetchall = counted_fetchone, counted_fetchmany, counted_fetchall
+
+
+class QueryBudgetMiddleware:
+    """
+    Checks each request against the `query_budgets` of the view serving it.
+
+    Views declare {action (or HTTP method): QueryBudget(queries, rows)}. Over-budget requests raise
+    QueryBudgetExceeded when settings.QUERY_BUDGET_ENFORCE is on (development) and are
+    logged as warnings otherwise.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        usage = QueryUsage()
+        token = CURRENT_USAGE.set(usage)
+        try:
+            with connection.execute_wrapper(usage):
+                response = self.get_response(request)
+        finally:
+            CURRENT_USAGE.reset(token)
+
+        if usage.budget is not None:
+            self.check_budget(usage)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, "cls", None)  # Set by APIView.as_view()
+        budgets = getattr(view_class, "query_budgets", None)
+        usage = CURRENT_USAGE.get()
+        if not budgets or usage is None:
+            return None
+
+        method = request.method.lower()
+        action = (getattr(view_func, "actions", None) or {}).get(method, method)  # ViewSet routes map methods
+        if action in budgets:
+            usage.view_name = f"{view_class.__name__}.{action}"
+            usage.budget = budgets[action]
+        return None
+
+    def check_budget(self, usage):
+        budget = usage.budget
+        overruns = []
+        if budget.queries is not None and usage.queries > budget.queries:
+            overruns.append(f"{usage.queries} queries (budget {budget.queries})")
+        if budget.rows is not None and usage.rows > budget.rows:
+            overruns.append(f"{usage.rows} rows (budget {budget.rows})")
+        if not overruns:
+            return
+
+        message = f"{usage.view_name} exceeded its query budget: {', '.join(overruns)}"
+        if settings.QUERY_BUDGET_ENFORCE:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
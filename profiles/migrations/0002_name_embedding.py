@@ -0,0 +1,77 @@
+# Generated by Django 5.1.6 on 2026-10-19 07:37
+
+import hashlib
+
+import django.db.models.deletion
+import profiles.validators
+from django.conf import settings
+from django.db import migrations, models
+
+
+def move_embeddings_to_name_store(apps, schema_editor):
+    """
+    Copy each distinct name's stored vector into NameEmbedding and link every Person to it,
+    writing the links with one bulk_update per chunk.
+    """
+    NameEmbedding = apps.get_model("profiles", "NameEmbedding")
+    Person = apps.get_model("profiles", "Person")
+    model_id = f"{settings.EMBEDDING_MODEL_NAME}:{settings.EMBEDDING_RUNTIME}:v{settings.EMBEDDING_MODEL_VERSION}"
+
+    chunk_size = 2000
+    embedding_ids = {}
+    linked = []
+    persons = Person.objects.exclude(embedding__in=["", "[]"]).order_by("id")
+    for person in persons.only("id", "first_name", "last_name", "embedding").iterator(chunk_size=chunk_size):
+        name = " ".join(f"{person.first_name} {person.last_name}".casefold().split())
+        key = hashlib.sha256(f"{model_id}\n{name}".encode()).hexdigest()
+        if key not in embedding_ids:
+            embedding_ids[key] = NameEmbedding.objects.create(key=key, model_name=model_id, vector=person.embedding).id
+        person.name_embedding_id = embedding_ids[key]
+        linked.append(person)
+        if len(linked) == chunk_size:
+            Person.objects.bulk_update(linked, ["name_embedding"])
+            linked = []
+    Person.objects.bulk_update(linked, ["name_embedding"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NameEmbedding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('model_name', models.CharField(max_length=255)),
+                ('vector', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Name embedding',
+            },
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='name_embedding',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='persons', to='profiles.nameembedding'),
+        ),
+        migrations.RunPython(move_embeddings_to_name_store, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='person',
+            name='embedding',
+        ),
+        migrations.AlterModelManagers(
+            name='person',
+            managers=[
+            ],
+        ),
+        migrations.AlterField(
+            model_name='person',
+            name='date_of_birth',
+            field=models.DateField(validators=[profiles.validators.validate_date_of_birth]),
+        ),
+    ]
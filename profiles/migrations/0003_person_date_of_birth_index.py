@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-19 07:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('profiles', '0002_name_embedding'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='person',
+            index=models.Index(fields=['date_of_birth'], name='person_date_of_birth_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.6 on 2026-10-19 07:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('profiles', '0003_person_date_of_birth_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='person',
+            name='first_name_phonetic',
+            field=models.CharField(blank=True, editable=False, max_length=4),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='last_name_phonetic',
+            field=models.CharField(blank=True, editable=False, max_length=4),
+        ),
+        migrations.AddIndex(
+            model_name='person',
+            index=models.Index(fields=['first_name_phonetic'], name='person_first_phonetic_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='person',
+            index=models.Index(fields=['last_name_phonetic'], name='person_last_phonetic_idx'),
+        ),
+    ]
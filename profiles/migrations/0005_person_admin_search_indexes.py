@@ -0,0 +1,22 @@
+# Generated by Django 5.1.6 on 2026-10-19 07:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('profiles', '0004_person_phonetic_keys'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='person',
+            index=models.Index(fields=['email'], name='person_email_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='person',
+            index=models.Index(fields=['phone'], name='person_phone_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.6 on 2026-10-19 07:46
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('profiles', '0005_person_admin_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PersonTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('person_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Person tombstone',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='person',
+            index=models.Index(fields=['updated_at', 'id'], name='person_updated_at_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='persontombstone',
+            index=models.Index(fields=['deleted_at', 'id'], name='tombstone_deleted_at_id_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.6 on 2026-10-19 08:08
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0006_person_change_feed'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='nameembedding',
+            options={'base_manager_name': 'objects', 'verbose_name': 'Name embedding'},
+        ),
+    ]
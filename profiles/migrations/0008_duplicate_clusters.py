@@ -0,0 +1,26 @@
+# Generated by Django 5.1.6 on 2026-10-19 08:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0007_nameembedding_base_manager'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DuplicateCluster',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reasons', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('persons', models.ManyToManyField(related_name='duplicate_clusters', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Duplicate cluster',
+            },
+        ),
+    ]
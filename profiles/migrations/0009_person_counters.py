@@ -0,0 +1,58 @@
+# Generated by Django 5.1.6 on 2026-10-19 08:15
+
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def count_existing_persons(apps, schema_editor):
+    """
+    Fill the counters for the persons already stored, as reconcile_person_counters() computes them:
+    total, per role, per birth date and per signup day still inside the window.
+    """
+    Person = apps.get_model("profiles", "Person")
+    PersonCounter = apps.get_model("profiles", "PersonCounter")
+
+    persons = Person.objects.order_by()
+    counters = Counter(total=persons.count())
+    for role, count in persons.values_list("role").annotate(count=Count("id")):
+        counters[f"role:{role}"] = count
+    for date_of_birth, count in persons.values_list("date_of_birth").annotate(count=Count("id")):
+        counters[f"birth_date:{date_of_birth.isoformat()}"] = count
+    first_signup_day = timezone.localdate() - timedelta(days=settings.PERSON_STATS_SIGNUP_DAYS - 1)
+    signup_days = persons.filter(created_at__date__gte=first_signup_day).annotate(
+        day=TruncDate("created_at")
+    ).values_list("day")
+    for day, count in signup_days.annotate(count=Count("id")):
+        counters[f"signup_day:{day.isoformat()}"] = count
+
+    PersonCounter.objects.bulk_create(
+        [PersonCounter(name=name, value=value) for name, value in counters.items()], batch_size=2000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0008_duplicate_clusters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PersonCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64, unique=True)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Person counter',
+            },
+        ),
+        migrations.RunPython(count_existing_persons, migrations.RunPython.noop),
+    ]
@@ -1,15 +1,34 @@
-import json
 from datetime import date
 
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.utils import timezone
 
 from profiles.choices import Role
-from profiles.managers import PersonManager
-from profiles.utils import get_embedding_model
+from profiles.managers import NameEmbeddingManager, PersonManager
+from profiles.utils import get_embedding_model_id, get_name_embedding_key, normalize_name, soundex
 from profiles.validators import validate_date_of_birth
 
 
+class NameEmbedding(models.Model):
+    """
+    Vector embedding of a normalized full name, shared by every Person with that name.
+    """
+    key = models.CharField(max_length=64, unique=True)  # sha256 of model id + normalized name
+    model_name = models.CharField(max_length=255)  # Model id the vector was produced with
+    vector = models.TextField()  # Stores vector embeddings in text format
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = NameEmbeddingManager()
+
+    class Meta:
+        verbose_name = "Name embedding"
+        base_manager_name = "objects"  # person.name_embedding also leaves the vector deferred
+
+    def __str__(self):
+        return f"{self.model_name} {self.key[:12]}"
+
+
 # Create your models here.
 class Person(AbstractUser):
     """
@@ -18,7 +37,11 @@ class Person(AbstractUser):
     phone = models.CharField(max_length=15)
     date_of_birth = models.DateField(validators=[validate_date_of_birth])
     role = models.CharField(max_length=10, choices=Role.choices, default=Role.GUEST)
-    embedding = models.TextField()  # Stores vector embeddings in text format
+    first_name_phonetic = models.CharField(max_length=4, blank=True, editable=False)  # Soundex of first_name
+    last_name_phonetic = models.CharField(max_length=4, blank=True, editable=False)  # Soundex of last_name
+    name_embedding = models.ForeignKey(
+        NameEmbedding, null=True, blank=True, on_delete=models.SET_NULL, related_name="persons"
+    )  # Shared embedding of the full name
     created_at = models.DateTimeField(auto_now_add=True)  # Set only once when created
     updated_at = models.DateTimeField(auto_now=True)  # Updates every time the record changes
 
@@ -28,35 +51,119 @@ class Person(AbstractUser):
 
     class Meta:
         verbose_name = "Person"
+        indexes = [
+            models.Index(fields=["date_of_birth"], name="person_date_of_birth_idx"),  # Age filters and ordering
+            models.Index(fields=["first_name_phonetic"], name="person_first_phonetic_idx"),  # Fuzzy search
+            models.Index(fields=["last_name_phonetic"], name="person_last_phonetic_idx"),
+            models.Index(fields=["email"], name="person_email_idx"),  # Admin exact search
+            models.Index(fields=["phone"], name="person_phone_idx"),  # Admin prefix search
+            models.Index(fields=["updated_at", "id"], name="person_updated_at_id_idx"),  # Change feed keyset
+        ]
 
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_name = (instance.__dict__.get("first_name"), instance.__dict__.get("last_name"))
+        instance._loaded_stats = (instance.__dict__.get("role"), instance.__dict__.get("date_of_birth"))
+        return instance
+
     def save(self, *args, **kwargs):
         """
-        Generate and store the embedding when saving the Person instance.
+        Store phonetic name keys and link the shared name embedding when saving the Person instance.
+        The embedding is relinked when the name or the configured model id changed, and names are only
+        encoded when no other Person already has them.
         """
-        add_embedding = True
+        update_fields = set(kwargs["update_fields"]) if kwargs.get("update_fields") is not None else None
+        if not (self.pk and update_fields is not None and {"first_name", "last_name"}.isdisjoint(update_fields)):
+            self.first_name_phonetic = soundex(self.first_name)
+            self.last_name_phonetic = soundex(self.last_name)
 
-        update_fields = set(kwargs["update_fields"]) if "update_fields" in kwargs else None
-        if self.pk and update_fields and {"first_name", "last_name"}.isdisjoint(update_fields):
-            add_embedding = False  # Skip embedding update if name fields haven't changed
-
-        if add_embedding:
             full_name = f"{self.first_name} {self.last_name}".strip()
             try:
-                embedding_model = get_embedding_model()
-                embedding_vector = embedding_model.encode(full_name).tolist()
-                self.embedding = json.dumps(embedding_vector)  # Store as JSON string
+                # Keep the linked embedding only if it is this name's under the current model id
+                key = get_name_embedding_key(normalize_name(full_name), get_embedding_model_id())
+                if self.linked_embedding_key() != key:
+                    self.name_embedding = NameEmbedding.objects.for_names([full_name])[normalize_name(full_name)]
             except Exception:
-                self.embedding = json.dumps([])  # Store empty embedding in case of failure
+                self.name_embedding = None  # Store no embedding in case of failure
+
+            if update_fields is not None:
+                kwargs["update_fields"] = update_fields | {"first_name_phonetic", "last_name_phonetic"}
+                kwargs["update_fields"].add("name_embedding")
         super().save(*args, **kwargs)
+        self._loaded_name = (self.__dict__.get("first_name"), self.__dict__.get("last_name"))
+        self.__dict__.pop("_age", None)  # An annotated age may no longer match date_of_birth
+
+    def linked_embedding_key(self):
+        """
+        Key of the linked NameEmbedding, from the cached relation or otherwise in one query.
+        """
+        if self.name_embedding_id is None:
+            return None
+        if Person.name_embedding.is_cached(self):
+            return self.name_embedding.key
+        return NameEmbedding.objects.filter(pk=self.name_embedding_id).values_list("key", flat=True).first()
 
     @property
     def age(self):
         """
-        Calculate age based on date_of_birth.
+        Calculate age based on date_of_birth, unless the queryset annotated it (see PersonQuerySet.with_age).
         """
+        if "_age" in self.__dict__:
+            return self._age
         today = date.today()
         dob = self.date_of_birth
         return today.year - dob.year - ((today.month, today.day) < (dob.month, dob.day))
+
+    @age.setter
+    def age(self, value):
+        self._age = value  # Set by the `age` annotation
+
+
+class PersonTombstone(models.Model):
+    """
+    Record of a deleted Person, kept so the change feed can report deletions.
+    """
+    person_id = models.BigIntegerField()  # Id of the deleted Person (no foreign key, the row is gone)
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Person tombstone"
+        indexes = [
+            models.Index(fields=["deleted_at", "id"], name="tombstone_deleted_at_id_idx"),  # Change feed keyset
+        ]
+
+    def __str__(self):
+        return f"Person {self.person_id} deleted at {self.deleted_at}"
+
+
+class DuplicateCluster(models.Model):
+    """
+    Group of Person records that likely describe the same person, written by `find_duplicates`.
+    """
+    persons = models.ManyToManyField(Person, related_name="duplicate_clusters")
+    reasons = models.JSONField(default=list)  # Matching signals: "name", "email" and/or "phone"
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Duplicate cluster"
+
+    def __str__(self):
+        return f"Duplicate cluster {self.pk} ({', '.join(self.reasons)})"
+
+
+class PersonCounter(models.Model):
+    """
+    Person statistic kept up to date on every create/update/delete (see profiles.stats).
+    """
+    name = models.CharField(max_length=64, unique=True)  # e.g. "total", "role:admin", "birth_date:1990-05-15"
+    value = models.BigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Person counter"
+
+    def __str__(self):
+        return f"{self.name} = {self.value}"
@@ -2,19 +2,32 @@ from django.contrib.auth.hashers import make_password
 
 from rest_framework import serializers
 
-from profiles.models import Person
+from profiles.models import DuplicateCluster, Person
 
 
-class PersonSerializer(serializers.ModelSerializer):
+class DynamicFieldsMixin:
+    """
+    Serializer mixin taking an optional `fields` argument that limits the readable fields to those names.
+    """
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop("fields", None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields).difference(fields):
+                if not self.fields[name].write_only:
+                    self.fields.pop(name)
+
+
+class PersonSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for full Person details."""
     age = serializers.ReadOnlyField()  # Read-only as it's calculated
 
     class Meta:
         model = Person
-        exclude = ['embedding']  # Exclude embedding field from API response as it's for internal use only
+        # Exclude embedding link and phonetic keys from API response as they're for internal use only
+        exclude = ['name_embedding', 'first_name_phonetic', 'last_name_phonetic']
         extra_kwargs = {
             'password': {'write_only': True},  # Make password write-only
-            'embedding': {'required': False}  # Not required during create/update
         }
 
     def create(self, validated_data):
@@ -22,10 +35,27 @@ class PersonSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
-class PersonSearchSerializer(serializers.ModelSerializer):
+class PersonSearchSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for searching/filtering Person data with limited fields."""
     age = serializers.ReadOnlyField()
 
     class Meta:
         model = Person
         fields = ['id', 'first_name', 'last_name', 'email', 'phone', 'date_of_birth', 'age']
+
+
+class PersonSimilaritySerializer(PersonSearchSerializer):
+    """Serializer for vector search results with their similarity score."""
+    score = serializers.FloatField(read_only=True)
+
+    class Meta(PersonSearchSerializer.Meta):
+        fields = PersonSearchSerializer.Meta.fields + ['score']
+
+
+class DuplicateClusterSerializer(serializers.ModelSerializer):
+    """Serializer for a stored cluster of likely duplicate persons."""
+    persons = PersonSearchSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = DuplicateCluster
+        fields = ['id', 'reasons', 'created_at', 'persons']
@@ -0,0 +1,45 @@
+from django.core.signals import setting_changed
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from profiles.autocomplete import NAME_PREFIX_INDEX
+from profiles.embedding_backends import get_embedding_backend
+from profiles.models import Person, PersonTombstone
+from profiles.stats import person_deleted, person_saved
+
+
+@receiver(post_delete, sender=Person)
+def record_person_tombstone(sender, instance, **kwargs):
+    """Record the deletion so change-feed consumers can remove the Person too."""
+    PersonTombstone.objects.create(person_id=instance.pk)
+
+
+@receiver(post_save, sender=Person)
+def index_saved_person_name(sender, instance, created, **kwargs):
+    """Keep this process's autocomplete index in step with the saved name."""
+    NAME_PREFIX_INDEX.person_saved(instance, created)
+
+
+@receiver(post_delete, sender=Person)
+def unindex_deleted_person_name(sender, instance, **kwargs):
+    """Drop the deleted person's name from this process's autocomplete index."""
+    NAME_PREFIX_INDEX.person_deleted(instance)
+
+
+@receiver(post_save, sender=Person)
+def count_saved_person(sender, instance, created, update_fields=None, **kwargs):
+    """Keep the Person statistics counters in step with the saved role and date of birth."""
+    person_saved(instance, created, update_fields)
+
+
+@receiver(post_delete, sender=Person)
+def uncount_deleted_person(sender, instance, **kwargs):
+    """Remove the deleted person from the Person statistics counters."""
+    person_deleted(instance)
+
+
+@receiver(setting_changed)
+def reset_embedding_backend(sender, setting, **kwargs):
+    """Drop the cached embedding backend when an EMBEDDING_* setting changes (e.g. override_settings)."""
+    if setting.startswith("EMBEDDING_"):
+        get_embedding_backend.cache_clear()
@@ -0,0 +1,186 @@
+from collections import Counter
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, CharField, Count, F, Q, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from profiles.choices import Role
+from profiles.models import Person, PersonCounter
+
+SIGNUP_DAY_PREFIX = "signup_day:"
+BIRTH_DATE_PREFIX = "birth_date:"
+AGE_BUCKET_PREFIX = "age:"
+OLDEST_AGE_BUCKET = 150  # Ages above it are counted in this bucket
+CASE_UPDATE_MAX_COUNTERS = 32  # Beyond this, apply_counter_deltas() upserts row by row
+
+
+def signup_window_start(today=None):
+    """First day whose signups are still counted (settings.PERSON_STATS_SIGNUP_DAYS including today)."""
+    return (today or timezone.localdate()) - timedelta(days=settings.PERSON_STATS_SIGNUP_DAYS - 1)
+
+
+def signup_day(counter_name):
+    return date.fromisoformat(counter_name[len(SIGNUP_DAY_PREFIX):])
+
+
+def counter_names(role, date_of_birth, created_at=None):
+    """
+    Counters a person with these values belongs to; values that are unknown (None) are skipped.
+    """
+    names = ["total"]
+    if role is not None:
+        names.append(f"role:{role}")
+    if date_of_birth is not None:
+        names.append(f"{BIRTH_DATE_PREFIX}{date_of_birth.isoformat()}")
+    if created_at is not None:
+        day = timezone.localdate(created_at)
+        if day >= signup_window_start():  # Older days are no longer kept
+            names.append(f"{SIGNUP_DAY_PREFIX}{day.isoformat()}")
+    return names
+
+
+def apply_counter_deltas(deltas):
+    """
+    Add {counter name: delta} to the stored counters, creating missing counters.
+
+    The few counters of a single save take two queries: an insert of missing names and one UPDATE
+    with a CASE. Larger sets, such as a seeded batch touching thousands of birth dates, are upserted
+    with one executemany() instead, as the database evaluates the CASE once per matched row.
+    """
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    if len(deltas) > CASE_UPDATE_MAX_COUNTERS and connection.features.supports_update_conflicts_with_target:
+        quote = connection.ops.quote_name
+        table, name, value = quote(PersonCounter._meta.db_table), quote("name"), quote("value")
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {table} ({name}, {value}) VALUES (%s, %s) "
+                f"ON CONFLICT ({name}) DO UPDATE SET {value} = {table}.{value} + EXCLUDED.{value}",
+                list(deltas.items()),
+            )
+        return
+    PersonCounter.objects.bulk_create([PersonCounter(name=name) for name in deltas], ignore_conflicts=True)
+    PersonCounter.objects.filter(name__in=deltas).update(
+        value=F("value") + Case(*[When(name=name, then=Value(delta)) for name, delta in deltas.items()], default=0)
+    )
+
+
+def person_saved(person, created, update_fields=None):
+    """
+    Apply a Person save to the counters; the previous role and date of birth come from the values
+    loaded from the database. Changes that cannot be applied are left to reconcile_person_counters().
+    """
+    values = (person.__dict__.get("role"), person.__dict__.get("date_of_birth"))
+    loaded = None if created else getattr(person, "_loaded_stats", None)
+    if created:
+        apply_counter_deltas(Counter(counter_names(*values, person.created_at)))
+    elif loaded is not None and None not in loaded:
+        if update_fields is not None:  # Only the saved fields changed in the database
+            values = tuple(
+                value if field in update_fields else old
+                for field, value, old in zip(("role", "date_of_birth"), values, loaded)
+            )
+        if None not in values and values != loaded:
+            deltas = Counter(counter_names(*values))
+            deltas.subtract(counter_names(*loaded))
+            apply_counter_deltas(deltas)
+    person._loaded_stats = values
+
+
+def person_deleted(person):
+    fields = ("role", "date_of_birth", "created_at")
+    apply_counter_deltas(Counter({name: -1 for name in counter_names(*map(person.__dict__.get, fields))}))
+
+
+def age_bucket_counter(today):
+    """
+    Expression naming the age bucket ("age:<min age>") of a birth date counter, or the counter
+    name for other counters. Birth date counters sort like their dates, so a person is at least
+    `age` on `today` when their counter name is at most the birth date `age` years before it.
+    """
+    def born_by(age):  # Also right for February 29, which sorts between the 28th and March 1st
+        return f"{BIRTH_DATE_PREFIX}{today.year - age:04d}-{today:%m-%d}"
+
+    is_birth_date = Q(name__startswith=BIRTH_DATE_PREFIX)
+    return Case(
+        *[
+            When(is_birth_date & Q(name__gt=born_by(bucket + 10)), then=Value(f"{AGE_BUCKET_PREFIX}{bucket}"))
+            for bucket in range(0, OLDEST_AGE_BUCKET, 10)
+        ],
+        When(is_birth_date, then=Value(f"{AGE_BUCKET_PREFIX}{OLDEST_AGE_BUCKET}")),
+        default=F("name"),
+        output_field=CharField(),
+    )
+
+
+def read_person_stats(days=7, today=None):
+    """
+    Person statistics from the stored counters, in one query whatever the number of persons:
+
+    * total and count per role
+    * age histogram in 10-year buckets of the ages reached by `today`, summed from the birth date
+      counters in the database
+    * persons created over the last `days` calendar days, today included
+    """
+    today = today or timezone.localdate()
+    counters = dict(
+        PersonCounter.objects.values_list(age_bucket_counter(today)).annotate(value=Sum("value")).order_by()
+    )
+
+    ages = Counter()
+    recent_signups = 0
+    first_signup_day = today - timedelta(days=days - 1)
+    for name, value in counters.items():
+        if name.startswith(AGE_BUCKET_PREFIX) and value:
+            ages[int(name[len(AGE_BUCKET_PREFIX):])] += value
+        elif name.startswith(SIGNUP_DAY_PREFIX) and signup_day(name) >= first_signup_day:
+            recent_signups += value
+
+    return {
+        "total": counters.get("total", 0),
+        "by_role": {role: counters.get(f"role:{role}", 0) for role in Role.values},
+        "age_histogram": [
+            {"min_age": bucket, "max_age": bucket + 9, "count": ages[bucket]} for bucket in sorted(ages)
+        ],
+        "recent_signups": {"days": days, "count": recent_signups},
+    }
+
+
+@transaction.atomic
+def reconcile_person_counters():
+    """
+    Recompute every counter with aggregate queries and store the result, dropping signup days
+    that left the window. Returns {counter name: (stored, actual)} for the counters that drifted.
+
+    The counters are locked first, so saves made meanwhile wait and apply on top of the result.
+    """
+    stored = dict(PersonCounter.objects.select_for_update().values_list("name", "value"))
+    first_signup_day = signup_window_start()
+
+    persons = Person.objects.order_by()
+    actual = Counter(total=persons.count())
+    for role, count in persons.values_list("role").annotate(count=Count("id")):
+        actual[f"role:{role}"] = count
+    for date_of_birth, count in persons.values_list("date_of_birth").annotate(count=Count("id")):
+        actual[f"{BIRTH_DATE_PREFIX}{date_of_birth.isoformat()}"] = count
+    signup_days = persons.filter(created_at__date__gte=first_signup_day).annotate(
+        day=TruncDate("created_at")
+    ).values_list("day")
+    for day, count in signup_days.annotate(count=Count("id")):
+        actual[f"{SIGNUP_DAY_PREFIX}{day.isoformat()}"] = count
+
+    PersonCounter.objects.exclude(name__in=actual).delete()
+    PersonCounter.objects.bulk_create(
+        [PersonCounter(name=name, value=value) for name, value in actual.items()],
+        update_conflicts=True, unique_fields=["name"], update_fields=["value"],
+    )
+    return {
+        name: (stored.get(name, 0), actual.get(name, 0))
+        for name in stored.keys() | actual.keys()
+        if stored.get(name, 0) != actual.get(name, 0)
+        and not (name.startswith(SIGNUP_DAY_PREFIX) and signup_day(name) < first_signup_day)  # Expired, not drift
+    }
@@ -1,17 +1,121 @@
+import json
+import os
+import tempfile
+from contextlib import contextmanager
 from datetime import date, timedelta
+from io import StringIO
+from unittest import mock
 
-from django.core.exceptions import ValidationError
+from django.conf import settings
+from django.contrib.auth.models import Group, Permission
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils.timezone import now
 
+import numpy as np
 from rest_framework import status
 from rest_framework.authtoken.models import Token
-from rest_framework.test import APITestCase
+from rest_framework.test import APITestCase, APITransactionTestCase
 
+from profiles.autocomplete import NAME_PREFIX_INDEX
 from profiles.choices import Role
-from profiles.models import Person
+from profiles.middleware import QueryBudget, QueryBudgetExceeded
+from profiles.models import DuplicateCluster, NameEmbedding, Person, PersonCounter, PersonTombstone
+from profiles.pagination import EstimatedCountPaginator
+from profiles.stats import apply_counter_deltas, read_person_stats, reconcile_person_counters
+from profiles.utils import (
+    build_faiss_index,
+    encode_names,
+    find_similar_persons,
+    get_embedding_model,
+    get_embedding_model_id,
+    get_index_factory_string,
+    load_person_embeddings,
+    soundex,
+)
+from profiles.validators import validate_date_of_birth
+from profiles.views import PersonViewSet
+from profiles.vector_index import (
+    CURRENT_POINTER,
+    VectorIndexArtifact,
+    get_active_vector_index,
+    read_current_version,
+)
 
 
+def constant_encoder(names):
+    """Callable embedding backend used by EmbeddingBackendTests."""
+    return [[1.0, 0.0, 0.0] for _ in names]
+
+
+def unscaled_encoder(names):
+    """Callable embedding backend returning vectors that are not unit length."""
+    return [[len(name), len(name), 0.0] if name.startswith("a") else [0.0, 3.0, 4.0] for name in names]
+
+
+def create_person(username, first_name="Test", last_name="Person", **fields):
+    """Create a Person with valid defaults; keyword arguments override any other field."""
+    return Person.objects.create_user(**{
+        "username": username,
+        "email": f"{username}@example.com",
+        "first_name": first_name,
+        "last_name": last_name,
+        "phone": "5550000000",
+        "date_of_birth": date(1990, 1, 1),
+        "password": "password",
+        **fields,
+    })
+
+
+class QueryBudgetTestMixin:
+    """
+    Helpers for asserting that requests stay within their view's declared query budget.
+    """
+    def assertWithinQueryBudget(self, method, url, data=None):
+        """
+        Send the request with budget enforcement on, so QueryBudgetMiddleware raises on overruns.
+        """
+        with override_settings(QUERY_BUDGET_ENFORCE=True):
+            response = getattr(self.client, method)(url, data, format="json")
+        self.assertLess(response.status_code, 400, f"{method.upper()} {url} failed: {response.data}")
+        return response
+
+
+class TemporaryMediaRootMixin:
+    """
+    Point MEDIA_ROOT and VECTOR_INDEX_DIR at a temporary directory, so FAISS files written while
+    searching stay out of the project's media directory.
+    """
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        directory = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(directory.cleanup)
+        settings_override = override_settings(
+            MEDIA_ROOT=directory.name, VECTOR_INDEX_DIR=os.path.join(directory.name, "vector_index")
+        )
+        settings_override.enable()
+        cls.addClassCleanup(settings_override.disable)
+
+
+@contextmanager
+def forbid_vector_reads(test_case):
+    """
+    Fail `test_case` if any query inside the block selects the stored name vectors.
+    """
+    def guard(execute, sql, params, many, context):
+        test_case.assertNotIn('"profiles_nameembedding"."vector"', sql, "Name vectors read outside vector search")
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(guard):
+        yield
+
+
+@override_settings(EMBEDDING_BACKEND="hashing")
 class PersonModelTests(APITestCase):
     """
     Test cases for the Person model, including validations and business logic.
@@ -76,6 +180,18 @@ class PersonModelTests(APITestCase):
         expected_age = today.year - 1990 - ((today.month, today.day) < (5, 15))
         self.assertEqual(self.person.age, expected_age)
 
+    def test_age_annotation_matches_property(self):
+        """
+        The SQL age annotation should agree with the age property, including leap-day birthdays.
+        """
+        self.person.date_of_birth = date(2000, 2, 29)
+        self.person.save()
+        for today in (date(2025, 2, 28), date(2025, 3, 1), date(2024, 2, 29), date(2024, 2, 28)):
+            annotated = Person.objects.with_age(today=today).get(pk=self.person.pk)
+            expected = today.year - 2000 - ((today.month, today.day) < (2, 29))
+            self.assertEqual(annotated.age, expected)
+            self.assertEqual(Person.objects.filter_by_age(expected, expected, today=today).count(), 1)
+
     def test_date_of_birth_too_old(self):
         """
         Test that a date of birth before 1901 raises a validation error.
@@ -122,8 +238,17 @@ class PersonModelTests(APITestCase):
         with self.assertRaises(Person.DoesNotExist):
             Person.objects.get(id=person_id)  # Ensure the object is deleted
 
+    def test_person_delete_records_tombstone(self):
+        """
+        Deleting a Person should record a tombstone for change-feed consumers.
+        """
+        person_id = self.person.id
+        self.person.delete()
+        self.assertTrue(PersonTombstone.objects.filter(person_id=person_id).exists())
+
 
-class PersonViewSetTests(APITestCase):
+@override_settings(EMBEDDING_BACKEND="hashing")
+class PersonViewSetTests(TemporaryMediaRootMixin, APITestCase):
     """
     Test cases for the PersonViewSet, covering CRUD operations and permissions.
     """
@@ -314,6 +439,182 @@ class PersonViewSetTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(response.data["error"], "Age must be an integer")
 
+    def test_person_search_by_age_range(self):
+        """
+        Searching with age_min/age_max should return persons within the inclusive range.
+        """
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Token {self.guest_token.key}")
+        url = reverse("profiles:person-search") + "?ordering=age"
+        url += f"&age_min={self.guest_user.age}&age_max={self.person1.age}"
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([person["first_name"] for person in response.data], ["Scarlet", "John"])
+
+    def test_person_list_ordering_by_age(self):
+        """
+        The list endpoint should support ordering by age in both directions.
+        """
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Token {self.admin_token.key}")
+        response = self.client.get(reverse("profiles:person-list") + "?ordering=-age")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ages = [person["age"] for person in response.data["results"]]
+        self.assertEqual(ages, sorted(ages, reverse=True))
+        self.assertEqual(response.data["results"][0]["first_name"], "Jane")
+
+    def test_invalid_ordering(self):
+        """
+        Unsupported ordering values should return a 400 error.
+        """
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Token {self.admin_token.key}")
+        response = self.client.get(reverse("profiles:person-list") + "?ordering=password")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_sparse_fieldset(self):
+        """
+        `fields` should limit both the serialized fields and the selected columns.
+        """
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Token {self.admin_token.key}")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("profiles:person-list") + "?fields=id,first_name,age")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data["results"][0]), {"id", "first_name", "age"})
+        person_queries = [query["sql"] for query in queries if 'FROM "profiles_person"' in query["sql"]]
+        self.assertFalse(any('"profiles_person"."email"' in sql for sql in person_queries))
+        self.assertFalse(any("profiles_person_groups" in query["sql"] for query in queries))
+
+    def test_retrieve_sparse_fieldset_with_m2m(self):
+        """
+        Many-to-many fields should be returned (and prefetched) only when requested.
+        """
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Token {self.admin_token.key}")
+        url = reverse("profiles:person-detail", args=[self.person1.id])
+        response = self.client.get(url + "?fields=username,groups")
+        self.assertEqual(response.data, {"username": "john_doe", "groups": []})
+
+        response = self.client.get(url + "?exclude=groups,user_permissions,last_login")
+        self.assertNotIn("groups", response.data)
+        self.assertNotIn("last_login", response.data)
+        self.assertEqual(response.data["email"], "john@example.com")
+
+    def test_search_sparse_fieldset(self):
+        """
+        Search should support `fields` on its limited serializer and reject unknown fields.
+        """
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Token {self.guest_token.key}")
+        response = self.client.get(reverse("profiles:person-search") + "?last_name=Niiv&fields=first_name")
+        self.assertEqual(sorted(response.data, key=lambda person: person["first_name"]),
+                         [{"first_name": "Jane"}, {"first_name": "John"}])
+
+        response = self.client.get(reverse("profiles:person-search") + "?last_name=Niiv&fields=password")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["error"], "Unknown fields: password")
+
+    def test_person_search_phonetic(self):
+        """
+        Phonetic fuzzy search should match sound-alike spellings.
+        """
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Token {self.guest_token.key}")
+        response = self.client.get(reverse("profiles:person-search") + "?last_name=Gost&fuzzy=phonetic")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([person["first_name"] for person in response.data], ["Scarlet"])
+
+        response = self.client.get(reverse("profiles:person-search") + "?last_name=Gost")
+        self.assertEqual(response.data, [])
+
+    def test_person_search_phonetic_without_letters(self):
+        """
+        Phonetic search on a name without letters has no key to match and should return a 400 error,
+        not every person.
+        """
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Token {self.guest_token.key}")
+        response = self.client.get(reverse("profiles:person-search") + "?first_name=123&fuzzy=phonetic")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(reverse("profiles:person-search") + "?first_name=123&last_name=Gost&fuzzy=phonetic")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_invalid_fuzzy_mode(self):
+        """
+        Unsupported fuzzy modes should return a 400 error.
+        """
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Token {self.guest_token.key}")
+        response = self.client.get(reverse("profiles:person-search") + "?first_name=Jon&fuzzy=typo")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_hybrid_search_ranks_exact_match_first(self):
+        """
+        Hybrid search should rank a person matching both lexically and by embedding first.
+        """
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.guest_token.key}")
+        url = reverse("profiles:person-hybrid-search") + "?name=John Niiv&vector_weight=0.5"
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]["first_name"], "John")
+        self.assertEqual(response.data[0]["lexical_rank"], 1)
+        self.assertEqual(response.data[0]["vector_rank"], 1)
+        self.assertIn("Jane", [person["first_name"] for person in response.data])
+        scores = [person["score"] for person in response.data]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+    def test_hybrid_search_invalid_params(self):
+        """
+        Hybrid search should validate the name, weights and limit.
+        """
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.guest_token.key}")
+        url = reverse("profiles:person-hybrid-search")
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(url + "?name=John&lexical_weight=x").status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(url + "?name=John&limit=0").status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(CHANGE_FEED_LAG_SECONDS=0)
+    def test_change_feed_pages_through_updates_and_deletes(self):
+        """
+        Following next_cursor should return every upsert and deletion exactly once.
+        """
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.admin_token.key}")
+        url = reverse("profiles:person-changes")
+        cursor = self.client.get(url, {"limit": 4}).data["next_cursor"]  # Consume the four setUp persons
+
+        self.person1.phone = "5555555555"
+        self.person1.save()
+        deleted_id = self.person2.id
+        self.person2.delete()
+
+        seen = []
+        while True:
+            response = self.client.get(url, {"cursor": cursor, "limit": 1})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen += [(entry["type"], entry["id"]) for entry in response.data["results"]]
+            cursor = response.data["next_cursor"]
+            if not response.data["has_more"]:
+                break
+        self.assertEqual(seen, [("upsert", self.person1.id), ("delete", deleted_id)])
+        self.assertEqual(self.client.get(url, {"cursor": cursor}).data["results"], [])
+
+    def test_change_feed_invalid_cursor(self):
+        """
+        A malformed cursor should return a 400 error.
+        """
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.admin_token.key}")
+        response = self.client.get(reverse("profiles:person-changes"), {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_guest_cannot_read_change_feed(self):
+        """
+        Guest users should not have access to the change feed.
+        """
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.guest_token.key}")
+        response = self.client.get(reverse("profiles:person-changes"))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
     def test_vector_search_by_valid_name(self):
         """
         Vector search should return correct results with a valid name.
@@ -354,8 +655,191 @@ class PersonViewSetTests(APITestCase):
         self.assertIsInstance(response.data, list)
         self.assertGreater(len(response.data), 0)
 
+    def test_vector_search_ranked_with_scores(self):
+        """
+        Vector search should order results by similarity and include the score of each metric.
+        """
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.guest_token.key}")
+        url = reverse("profiles:person-vector-search") + "?name=John Niiv&threshold=4&top_k=3"
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(len(response.data), 3)
+        self.assertEqual(response.data[0]["first_name"], "John")
+        self.assertAlmostEqual(response.data[0]["score"], 0, places=5)
+        distances = [person["score"] for person in response.data]
+        self.assertEqual(distances, sorted(distances))
+        self.assertEqual(sum('FROM "profiles_person" WHERE' in query["sql"] for query in queries), 1)
+
+        response = self.client.get(url + "&metric=cosine&threshold=-1")
+        self.assertEqual(response.data[0]["first_name"], "John")
+        self.assertAlmostEqual(response.data[0]["score"], 1, places=5)
+        similarities = [person["score"] for person in response.data]
+        self.assertEqual(similarities, sorted(similarities, reverse=True))
+
+    def test_vector_search_invalid_params(self):
+        """
+        Unknown metrics and out-of-range top_k or threshold values should return a 400 error.
+        """
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.guest_token.key}")
+        url = reverse("profiles:person-vector-search") + "?name=John"
+        invalid = ("&metric=dot", "&top_k=0", "&top_k=101", "&threshold=5", "&metric=cosine&threshold=2", "&top_k=x")
+        for params in invalid:
+            response = self.client.get(url + params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+
 
-class LoginViewTests(APITestCase):
+@override_settings(EMBEDDING_BACKEND="hashing")
+class AutocompleteTests(APITestCase):
+    """
+    Test cases for the in-memory name prefix index and the autocomplete endpoint.
+    """
+    def setUp(self):
+        NAME_PREFIX_INDEX.invalidate()  # Rolled-back rows from other tests sent no signals
+        self.user = create_person("guest", "Scarlet", "Gust")
+        create_person("john1", "John", "Smith")
+        create_person("john2", "john", "SMITH")
+        create_person("johanna", "Johanna", "Jones")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=self.user).key}")
+        self.url = reverse("profiles:person-autocomplete")
+
+    def test_suggests_first_and_last_name_prefixes(self):
+        """
+        Prefixes of first or last names should return distinct names with their person counts, most common first.
+        """
+        response = self.client.get(self.url, {"q": "jo"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [{"name": "John Smith", "count": 2}, {"name": "Johanna Jones", "count": 1}])
+        self.assertEqual(self.client.get(self.url, {"q": "SMI"}).data, [{"name": "John Smith", "count": 2}])
+        self.assertEqual(self.client.get(self.url, {"q": "john sm"}).data, [{"name": "John Smith", "count": 2}])
+        self.assertEqual(len(self.client.get(self.url, {"q": "j", "limit": 1}).data), 1)
+
+    def test_index_follows_saves_and_deletes(self):
+        """
+        Renames, new persons and deletions should be reflected without a rebuild.
+        """
+        self.client.get(self.url, {"q": "jo"})  # Build the index
+        johanna = Person.objects.get(username="johanna")
+        johanna.first_name = "Joan"
+        johanna.save()
+        Person.objects.get(username="john1").delete()
+        create_person("jolene", "Jolene", "Smith")
+
+        with self.assertNumQueries(1):  # Token authentication only
+            response = self.client.get(self.url, {"q": "jo"})
+        self.assertEqual(response.data, [
+            {"name": "Joan Jones", "count": 1}, {"name": "John Smith", "count": 1}, {"name": "Jolene Smith", "count": 1}
+        ])
+
+    def test_limit_keeps_most_common_names(self):
+        """
+        A limit should keep the most common matches, not the first ones in alphabetical order.
+        """
+        create_person("jones2", "Johanna", "Jones")
+        create_person("jones3", "Johanna", "Jones")
+        response = self.client.get(self.url, {"q": "jo", "limit": 1})
+        self.assertEqual(response.data, [{"name": "Johanna Jones", "count": 3}])
+
+    @override_settings(AUTOCOMPLETE_MAX_SCAN=3)
+    def test_prefixes_with_many_matches_rank_precomputed_names(self):
+        """
+        Prefixes matching more keys than a lookup scans should still return the most common names,
+        including names added after the index was built.
+        """
+        for username, first_name in (("aaron", "Aaron"), ("abel", "Abel"), ("ada", "Ada"), ("adam", "Adam")):
+            create_person(username, first_name, "Xu")
+        for number in range(3):
+            create_person(f"azzy{number}", "Azzy", "Popular")
+        NAME_PREFIX_INDEX.invalidate()
+        self.assertEqual(NAME_PREFIX_INDEX.suggest("a", 1), [{"name": "Azzy Popular", "count": 3}])
+        self.assertIn("a", NAME_PREFIX_INDEX.common_names)
+
+        for number in range(4):
+            create_person(f"lovelace{number}", "Ada", "Lovelace")
+        with self.assertNumQueries(0):
+            self.assertEqual(NAME_PREFIX_INDEX.suggest("a", 2), [
+                {"name": "Ada Lovelace", "count": 4}, {"name": "Azzy Popular", "count": 3}
+            ])
+
+    def test_aged_index_is_rebuilt_in_the_background(self):
+        """
+        Lookups on an aged index should be served at once while another thread rebuilds it.
+        """
+        self.addCleanup(NAME_PREFIX_INDEX.invalidate)
+        NAME_PREFIX_INDEX.suggest("jo")  # Build the index
+        NAME_PREFIX_INDEX.built_at -= settings.AUTOCOMPLETE_MAX_AGE + 1
+        with mock.patch.object(NAME_PREFIX_INDEX, "rebuild") as rebuild, self.assertNumQueries(0):
+            self.assertEqual(len(NAME_PREFIX_INDEX.suggest("jo")), 2)
+            NAME_PREFIX_INDEX.rebuild_thread.join()
+        rebuild.assert_called_once_with()
+        self.assertFalse(NAME_PREFIX_INDEX.rebuild_lock.locked())
+
+    def test_invalid_params(self):
+        """
+        A missing prefix or an out-of-range limit should return a 400 error.
+        """
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(self.url, {"q": "jo", "limit": 51}).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(EMBEDDING_BACKEND="hashing")
+class DuplicateDetectionTests(APITestCase):
+    """
+    Test cases for the find_duplicates command and the duplicates endpoint.
+    """
+    def setUp(self):
+        self.admin = create_person("admin", "Ada", "Admin", phone="5550000001", role=Role.ADMIN)
+        self.john = create_person("john", "John", "Smith", phone="5550000002")
+        self.jon = create_person("jon", "Jon", "Smith", phone="5550000003")
+        self.john_other = create_person(
+            "john2", "John", "Smith", phone="5550000004", date_of_birth=date(1970, 1, 1)
+        )
+        self.mary = create_person("mary", "Mary", "Jones", phone="5550000005", email="mary@example.com")
+        self.marie = create_person("marie", "Marie", "Brown", phone="5550000006", email=" MARY@example.com")
+        self.phone_a = create_person("phone_a", "Olga", "Ivanov", phone="555-000-0007")
+        self.phone_b = create_person("phone_b", "Wei", "Chen", phone="5550000007")
+
+    def stored_clusters(self):
+        return {
+            frozenset(cluster.persons.values_list("username", flat=True)): cluster.reasons
+            for cluster in DuplicateCluster.objects.all()
+        }
+
+    def test_find_duplicates_command(self):
+        """
+        Similar names with the same birth date, shared emails and shared phones should form clusters.
+        """
+        call_command("find_duplicates", threshold=0.6, batch_size=2, stdout=StringIO())
+        self.assertEqual(self.stored_clusters(), {
+            frozenset({"john", "jon"}): ["name"],
+            frozenset({"mary", "marie"}): ["email"],
+            frozenset({"phone_a", "phone_b"}): ["phone"],
+        })
+
+        # A rerun replaces the stored clusters
+        self.jon.delete()
+        call_command("find_duplicates", threshold=0.6, stdout=StringIO())
+        self.assertEqual(len(self.stored_clusters()), 2)
+
+    def test_duplicates_endpoint(self):
+        """
+        Admins should get the stored clusters with their persons; guests should be denied.
+        """
+        call_command("find_duplicates", threshold=0.6, stdout=StringIO())
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=self.admin).key}")
+        response = self.client.get(reverse("profiles:person-duplicates"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 3)
+        first = response.data["results"][0]
+        self.assertEqual(first["reasons"], ["name"])
+        self.assertEqual([person["id"] for person in first["persons"]], [self.john.id, self.jon.id])
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=self.mary).key}")
+        response = self.client.get(reverse("profiles:person-duplicates"))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+@override_settings(EMBEDDING_BACKEND="hashing")
+class LoginViewTests(QueryBudgetTestMixin, APITestCase):
     """
     Test cases for the login view, verifying authentication and token generation.
     """
@@ -379,8 +863,7 @@ class LoginViewTests(APITestCase):
         """
         A user with correct credentials should receive a token.
         """
-        response = self.client.post(
-            self.url, {"username": "testuser", "password": "testpassword"})
+        response = self.assertWithinQueryBudget("post", self.url, {"username": "testuser", "password": "testpassword"})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn("token", response.data)
 
@@ -392,3 +875,650 @@ class LoginViewTests(APITestCase):
             self.url, {"username": "testuser", "password": "wrongpassword"})
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(response.data["error"], "Invalid credentials")
+
+
+@override_settings(EMBEDDING_BACKEND="hashing")
+class PersonStatsTests(APITestCase):
+    """
+    Test cases for the incrementally maintained Person statistics counters and the stats endpoint.
+    """
+    def setUp(self):
+        self.admin = create_person("admin", date_of_birth=date(1980, 5, 1), role=Role.ADMIN)
+        self.guest = create_person("guest", date_of_birth=date(1990, 5, 1))
+        create_person("teen", date_of_birth=date.today() - timedelta(days=15 * 365))
+        self.url = reverse("profiles:person-stats")
+
+    def counters(self):
+        return dict(PersonCounter.objects.exclude(value=0).values_list("name", "value"))
+
+    def test_counters_follow_creates_updates_and_deletes(self):
+        """
+        Counters should match a full recount after every kind of change.
+        """
+        self.assertEqual(reconcile_person_counters(), {})
+
+        self.guest.role = Role.ADMIN
+        self.guest.date_of_birth = date(1970, 5, 1)
+        self.guest.save()
+        teen = Person.objects.get(username="teen")
+        teen.role = Role.ADMIN  # Not saved below
+        teen.date_of_birth = date(2000, 1, 1)
+        teen.save(update_fields=["date_of_birth"])
+        Person.objects.filter(username="admin").delete()
+        counters = self.counters()
+        self.assertEqual(counters["total"], 2)
+        self.assertEqual(counters["role:admin"], 1)
+        self.assertNotIn("birth_date:1980-05-01", counters)
+        self.assertEqual(reconcile_person_counters(), {})
+
+    def test_stats_endpoint(self):
+        """
+        Admins should get totals, role counts, an age histogram and recent signups from the counters.
+        """
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=self.admin).key}")
+        with self.assertNumQueries(2):  # Token authentication and the counters
+            response = self.client.get(self.url, {"days": 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["total"], 3)
+        self.assertEqual(response.data["by_role"], {"admin": 1, "guest": 2})
+        self.assertIn({"min_age": 10, "max_age": 19, "count": 1}, response.data["age_histogram"])
+        self.assertEqual(sum(bucket["count"] for bucket in response.data["age_histogram"]), 3)
+        self.assertEqual(response.data["recent_signups"], {"days": 1, "count": 3})
+
+        self.assertEqual(self.client.get(self.url, {"days": 0}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=self.guest).key}")
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_reconcile_command_corrects_drift(self):
+        """
+        Drifted counters should be corrected and signup days outside the window dropped by the command.
+        """
+        PersonCounter.objects.filter(name="total").update(value=10)
+        PersonCounter.objects.create(name="signup_day:2000-01-01", value=5)
+        out = StringIO()
+        call_command("reconcile_person_stats", stdout=out)
+        self.assertIn("total: 10 -> 3", out.getvalue())
+        self.assertIn("1 counters corrected", out.getvalue())
+        self.assertEqual(self.counters()["total"], 3)
+        self.assertFalse(PersonCounter.objects.filter(name="signup_day:2000-01-01").exists())
+
+    def test_seeded_persons_are_counted(self):
+        """
+        Persons inserted by seed_persons (bulk_create, no signals) should still be counted.
+        """
+        call_command("seed_persons", 20, stdout=StringIO())
+        self.assertEqual(self.counters()["total"], 23)
+        self.assertEqual(reconcile_person_counters(), {})
+
+    def test_large_delta_sets_are_upserted(self):
+        """
+        Delta sets too large for one CASE update should add to existing counters and create missing ones.
+        """
+        deltas = {f"birth_date:2001-01-{day:02d}": day for day in range(1, 32)}
+        deltas.update({"total": 2, "role:guest": -1, "birth_date:1990-05-01": 3})
+        expected = {name: self.counters().get(name, 0) + delta for name, delta in deltas.items()}
+        apply_counter_deltas(deltas)
+        self.assertEqual({name: self.counters().get(name, 0) for name in deltas}, expected)
+
+    def test_age_histogram_uses_reached_ages(self):
+        """
+        Persons whose birthday has not come yet this year should stay in the lower bucket.
+        """
+        PersonCounter.objects.all().delete()
+        create_person("before", date_of_birth=date(1996, 3, 31))
+        create_person("after", date_of_birth=date(1996, 4, 1))
+        create_person("leap", date_of_birth=date(2004, 2, 29))
+        expected = {
+            date(2026, 3, 31): {20: 2, 30: 1},
+            date(2026, 4, 1): {20: 1, 30: 2},
+            date(2024, 2, 28): {10: 1, 20: 2},
+            date(2024, 2, 29): {20: 3},
+        }
+        for today, buckets in expected.items():
+            with self.subTest(today=today):
+                histogram = read_person_stats(today=today)["age_histogram"]
+                self.assertEqual({bucket["min_age"]: bucket["count"] for bucket in histogram}, buckets)
+
+
+
+@override_settings(EMBEDDING_BACKEND="hashing", CHANGE_FEED_LAG_SECONDS=0, VECTOR_INDEX_CHECK_INTERVAL=0)
+class PersonViewSetQueryBudgetTests(TemporaryMediaRootMixin, QueryBudgetTestMixin, APITransactionTestCase):
+    """
+    Test cases checking every PersonViewSet action against its query budget as the table grows.
+
+    Requests run outside a wrapping test transaction, so writes pay for their own BEGIN/COMMIT as
+    they do when serving real requests.
+    """
+    dataset_sizes = (5, 50)
+
+    def setUp(self):
+        self.admin = Person.objects.create_user(
+            username="budget_admin",
+            email="budget@example.com",
+            first_name="John",
+            last_name="Smith",
+            password="adminpassword",
+            phone="5550000000",
+            date_of_birth=date(1980, 1, 1),
+            role=Role.ADMIN,
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=self.admin).key}")
+        self.group = Group.objects.create(name="Reviewers")
+        self.permission = Permission.objects.get(codename="view_person")
+
+    def grow_dataset(self, size):
+        """
+        Add seeded persons up to `size`, each with a group and a permission so m2m fields cost queries,
+        and rebuild the vector index artifact as the offline job would.
+        """
+        call_command("seed_persons", size - Person.objects.count(), embeddings="model", stdout=StringIO())
+        call_command("build_vector_index", stdout=StringIO())
+        for person in Person.objects.all():
+            person.groups.add(self.group)
+            person.user_permissions.add(self.permission)
+
+    def test_actions_stay_within_budget(self):
+        """
+        Each action should stay within its budget at every dataset size.
+        """
+        for size in self.dataset_sizes:
+            with self.subTest(size=size):
+                self.grow_dataset(size)
+                call_command("find_duplicates", stdout=StringIO())
+                person_id = Person.objects.exclude(id=self.admin.id).values_list("id", flat=True).first()
+                detail_url = reverse("profiles:person-detail", args=[person_id])
+                data = {
+                    "username": f"budget{size}",
+                    "password": "password",
+                    "phone": "5551112222",
+                    "date_of_birth": "1990-01-01",
+                    "first_name": "New",
+                    "last_name": "Person",
+                }
+
+                self.assertWithinQueryBudget("get", reverse("profiles:person-list") + "?page_size=100")
+                self.assertWithinQueryBudget("get", detail_url)
+                self.assertWithinQueryBudget("post", reverse("profiles:person-list"), data)
+                self.assertWithinQueryBudget("put", detail_url, {**data, "username": f"budget{size}-put"})
+                self.assertWithinQueryBudget("patch", detail_url, {"first_name": "Changed"})
+                self.assertWithinQueryBudget("get", reverse("profiles:person-search") + "?last_name=Smith")
+                self.assertWithinQueryBudget("get", reverse("profiles:person-autocomplete") + "?q=jo")
+                self.assertWithinQueryBudget("get", reverse("profiles:person-vector-search") + "?name=John Smith")
+                self.assertWithinQueryBudget("get", reverse("profiles:person-hybrid-search") + "?name=John Smith")
+                self.assertWithinQueryBudget("get", reverse("profiles:person-changes") + "?limit=1000")
+                self.assertWithinQueryBudget("get", reverse("profiles:person-duplicates") + "?page_size=100")
+                self.assertWithinQueryBudget("get", reverse("profiles:person-stats"))
+                self.assertWithinQueryBudget("delete", detail_url)
+
+    def test_overrun_raises_when_enforced(self):
+        """
+        An action exceeding its budget should raise while enforcement is on.
+        """
+        with mock.patch.dict(PersonViewSet.query_budgets, {"list": QueryBudget(queries=1)}):
+            with self.assertRaisesMessage(QueryBudgetExceeded, "PersonViewSet.list exceeded its query budget"):
+                self.assertWithinQueryBudget("get", reverse("profiles:person-list"))
+
+    def test_overrun_is_logged_when_not_enforced(self):
+        """
+        An action exceeding its budget should only log a warning when enforcement is off.
+        """
+        with mock.patch.dict(PersonViewSet.query_budgets, {"list": QueryBudget(queries=5, rows=1)}):
+            with self.assertLogs("profiles.middleware", level="WARNING") as logs:
+                with override_settings(QUERY_BUDGET_ENFORCE=False):
+                    response = self.client.get(reverse("profiles:person-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("rows (budget 1)", logs.output[0])
+
+    def test_values_list_rows_count_against_budget(self):
+        """
+        Rows fetched through values_list() should count, not only loaded model instances.
+        """
+        self.grow_dataset(5)
+        with mock.patch.dict(PersonViewSet.query_budgets, {"stats": QueryBudget(queries=2, rows=1)}):
+            with self.assertRaisesMessage(QueryBudgetExceeded, "PersonViewSet.stats exceeded its query budget"):
+                self.assertWithinQueryBudget("get", reverse("profiles:person-stats"))
+
+
+@override_settings(EMBEDDING_BACKEND="hashing")
+class SeedPersonsCommandTests(TestCase):
+    """
+    Test cases for the seed_persons management command.
+    """
+    def test_seed_creates_valid_persons(self):
+        """
+        Seeded persons should have valid dates of birth, roles and embeddings.
+        """
+        call_command("seed_persons", 50, seed=7, batch_size=20, stdout=StringIO())
+        self.assertEqual(Person.objects.count(), 50)
+        for person in Person.objects.select_related("name_embedding"):
+            validate_date_of_birth(person.date_of_birth)
+            self.assertIn(person.role, Role.values)
+            self.assertEqual(len(json.loads(person.name_embedding.vector)), 384)
+        self.assertTrue(Person.objects.first().check_password("password"))
+
+    def test_seed_is_reproducible(self):
+        """
+        The same seed should generate the same persons.
+        """
+        fields = ("first_name", "last_name", "phone", "date_of_birth", "role", "name_embedding__vector")
+        call_command("seed_persons", 20, seed=3, stdout=StringIO())
+        first_run = list(Person.objects.order_by("username").values_list(*fields))
+        Person.objects.all().delete()
+        call_command("seed_persons", 20, seed=3, stdout=StringIO())
+        self.assertEqual(list(Person.objects.order_by("username").values_list(*fields)), first_run)
+
+    def test_seed_appends_after_existing_usernames(self):
+        """
+        Without --offset a second run should continue the usernames; a clashing --offset should fail cleanly.
+        """
+        call_command("seed_persons", 5, stdout=StringIO())
+        call_command("seed_persons", 5, stdout=StringIO())
+        self.assertEqual(Person.objects.filter(username__in=["seed0", "seed9"]).count(), 2)
+        with self.assertRaisesMessage(CommandError, "Omit --offset"):
+            call_command("seed_persons", 5, offset=3, stdout=StringIO())
+        self.assertEqual(Person.objects.count(), 10)
+
+
+class EmbeddingRuntimeTests(TestCase):
+    """
+    Test cases for selecting the embedding runtime through settings.
+    """
+    @override_settings(EMBEDDING_RUNTIME="tensorflow")
+    def test_unknown_runtime_is_rejected(self):
+        """
+        An unsupported EMBEDDING_RUNTIME should raise ImproperlyConfigured.
+        """
+        with self.assertRaises(ImproperlyConfigured):
+            get_embedding_model()
+
+
+class EmbeddingBackendTests(TemporaryMediaRootMixin, TestCase):
+    """
+    Test cases for the EMBEDDING_BACKEND registry.
+    """
+    @override_settings(EMBEDDING_BACKEND="hashing", EMBEDDING_HASHING_DIMENSION=64)
+    def test_hashing_backend(self):
+        """
+        The hashing backend should return deterministic unit vectors placing similar names closer.
+        """
+        vectors = encode_names(["john niiv", "john niiv", "jon niiv", "scarlet gust"])
+        self.assertEqual(vectors.shape, (4, 64))
+        np.testing.assert_allclose(np.linalg.norm(vectors, axis=1), 1, rtol=1e-6)
+        np.testing.assert_array_equal(vectors[0], vectors[1])
+        self.assertGreater(vectors[0] @ vectors[2], vectors[0] @ vectors[3])
+        self.assertEqual(get_embedding_model_id(), "hashing-64:v1")
+
+    @override_settings(EMBEDDING_BACKEND="profiles.tests.constant_encoder")
+    def test_callable_backend(self):
+        """
+        A dotted path should be used as the encoder, with its path as the model id.
+        """
+        person = Person.objects.create_user(
+            username="callable",
+            email="callable@test.com",
+            first_name="Cal",
+            last_name="Able",
+            phone="1234567890",
+            date_of_birth=date(1990, 5, 15),
+            password="testpassword",
+        )
+        self.assertEqual(person.name_embedding.model_name, "profiles.tests.constant_encoder:v1")
+        self.assertEqual(find_similar_persons("Anyone").get(), person)
+
+    @override_settings(EMBEDDING_BACKEND="profiles.tests.unscaled_encoder")
+    def test_cosine_scores_ignore_vector_length(self):
+        """
+        Cosine scores should not depend on the length of the vectors a backend returns.
+        """
+        anna = create_person("anna", "Anna", "Leigh")
+        bob = create_person("bob", "Bob", "Stone")
+        self.assertEqual(list(find_similar_persons("Ann Lee", metric="cosine", threshold=0.5)), [anna])
+        scores = {
+            person: person.score for person in find_similar_persons("Ann Lee", metric="cosine", threshold=-1)
+        }
+        self.assertAlmostEqual(scores[anna], 1.0, places=5)
+        self.assertAlmostEqual(scores[bob], 21 / (7 * 2 ** 0.5 * 5), places=5)
+
+    @override_settings(EMBEDDING_BACKEND="profiles.tests.missing_encoder")
+    def test_unknown_backend_is_rejected(self):
+        """
+        A backend that is neither registered nor importable should raise ImproperlyConfigured.
+        """
+        with self.assertRaises(ImproperlyConfigured):
+            encode_names(["john"])
+
+
+class VectorIndexCompressionTests(TestCase):
+    """
+    Test cases for PCA / quantization of the FAISS index.
+    """
+    def test_factory_string_combines_stages(self):
+        """
+        PCA and the quantizer should be chained when there are enough vectors to train them.
+        """
+        self.assertEqual(get_index_factory_string(384, 1000), "Flat")
+        self.assertEqual(get_index_factory_string(384, 1000, pca_dim=64, quantizer="pq", pq_m=16), "PCA64,L2norm,PQ16")
+        self.assertEqual(get_index_factory_string(384, 1000, quantizer="sq8"), "SQ8")
+
+    def test_factory_string_falls_back_to_flat_for_small_tables(self):
+        """
+        Too few vectors to train PCA or PQ should fall back to an exact index.
+        """
+        self.assertEqual(get_index_factory_string(384, 10, pca_dim=64, quantizer="pq"), "Flat")
+
+    def test_invalid_pq_configuration(self):
+        """
+        PQ sub-quantizers that don't divide the dimension should raise ImproperlyConfigured.
+        """
+        with self.assertRaises(ImproperlyConfigured):
+            get_index_factory_string(384, 1000, quantizer="pq", pq_m=7)
+
+    def test_compressed_index_finds_stored_vector(self):
+        """
+        A compressed index should still return a stored vector as its own nearest neighbour.
+        """
+        embeddings = np.random.default_rng(0).standard_normal((500, 384)).astype("float32")
+        index = build_faiss_index(embeddings, "PCA64,SQ8")
+        _, indices = index.search(embeddings[:5], 1)
+        self.assertEqual(indices[:, 0].tolist(), [0, 1, 2, 3, 4])
+
+
+@override_settings(EMBEDDING_BACKEND="hashing")
+class VectorIndexArtifactTests(TemporaryMediaRootMixin, TestCase):
+    """
+    Test cases for the offline-built, versioned vector index.
+    """
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.index_dir = directory.name
+        settings_override = override_settings(VECTOR_INDEX_DIR=self.index_dir, VECTOR_INDEX_CHECK_INTERVAL=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.person = create_person("john", "John", "Doe")
+
+    def build(self, *args):
+        call_command("build_vector_index", *args, stdout=StringIO())
+        return read_current_version()
+
+    def test_build_publishes_version(self):
+        """
+        The command should write a complete version directory and point CURRENT at it.
+        """
+        version = self.build()
+        self.assertEqual(
+            sorted(os.listdir(os.path.join(self.index_dir, version))),
+            ["ids.npy", "index.faiss", "manifest.json", "trained.faiss"],
+        )
+        self.assertEqual(get_active_vector_index().version, version)
+        self.assertEqual(find_similar_persons("John Doe").get(), self.person)
+
+    def test_persons_updated_after_build_are_found(self):
+        """
+        Persons saved after the build should be searched exactly until the next build.
+        """
+        self.build()
+        jane = create_person("jane", "Jane", "Smith")
+        self.assertIn(jane, find_similar_persons("Jane Smith"))
+
+    def test_rebuild_swaps_version_and_prunes(self):
+        """
+        A rebuild should replace the active version and keep only the requested number on disk.
+        """
+        first = self.build("--keep", "1")
+        create_person("jane", "Jane", "Smith")
+        second = self.build("--keep", "1")
+        self.assertNotEqual(first, second)
+        self.assertEqual(get_active_vector_index().version, second)
+        self.assertEqual(get_active_vector_index().manifest["row_count"], 2)
+        self.assertEqual(sorted(os.listdir(self.index_dir)), sorted([CURRENT_POINTER, second]))
+
+    @override_settings(VECTOR_INDEX_QUANTIZER="sq8")
+    def test_updated_persons_are_scored_like_the_artifact(self):
+        """
+        Persons updated after a compressed build should get the distances the artifact's index gives.
+        """
+        for username in ("jon", "joan", "jane"):
+            create_person(username, username.title(), "Doe")
+        self.build()
+        artifact = get_active_vector_index()
+        query = encode_names(["john doe"])[:1]
+        person_ids, embeddings = load_person_embeddings()
+        indexed = dict(artifact.search(query, len(person_ids)))
+        scored = dict(zip(person_ids, artifact.score(query, embeddings)))
+        for person_id in person_ids:
+            self.assertAlmostEqual(scored[person_id], indexed[person_id], places=5)
+
+        self.person.save()  # Now searched as a recent row
+        self.assertAlmostEqual(
+            find_similar_persons("John Doe", top_k=1).get().score, indexed[self.person.id], places=5
+        )
+
+        # Versions built before trained.faiss existed fall back to a reset copy of the index
+        os.remove(os.path.join(artifact.path, "trained.faiss"))
+        legacy = VectorIndexArtifact(artifact.path)
+        self.assertEqual(legacy.score(query, embeddings), artifact.score(query, embeddings))
+
+    def test_deleted_persons_do_not_take_result_slots(self):
+        """
+        Persons deleted after the build should not reduce the number of results below top_k.
+        """
+        for username in ("jon", "joan", "jane", "johan"):
+            create_person(username, username.title(), "Doe")
+        self.build()
+        Person.objects.filter(username__in=["john", "jon"]).delete()
+        results = find_similar_persons("John Doe", top_k=2, threshold=4)
+        self.assertEqual(len(results), 2)
+        self.assertFalse({"john", "jon"} & {person.username for person in results})
+
+
+@override_settings(EMBEDDING_BACKEND="hashing")
+class NameEmbeddingTests(TemporaryMediaRootMixin, TestCase):
+    """
+    Test cases for the shared, deduplicated name embedding store.
+    """
+    def test_identical_names_share_one_embedding(self):
+        """
+        Persons with the same normalized name should reference a single stored embedding.
+        """
+        with mock.patch("profiles.managers.encode_names", wraps=encode_names) as encoder:
+            first = create_person("jack-1", "Jack", "Roy")
+            second = create_person("jack-2", " jack ", "ROY")
+        self.assertEqual(first.name_embedding_id, second.name_embedding_id)
+        self.assertEqual(NameEmbedding.objects.count(), 1)
+        self.assertEqual(encoder.call_count, 1)
+
+    def test_unchanged_name_is_not_re_encoded(self):
+        """
+        Saving a loaded Person without changing the name should not encode again.
+        """
+        person = Person.objects.get(pk=create_person("jack-roy", "Jack", "Roy").pk)
+        with mock.patch("profiles.managers.encode_names", wraps=encode_names) as encoder:
+            person.phone = "0987654321"
+            person.save()
+        encoder.assert_not_called()
+
+    def test_name_change_links_new_embedding(self):
+        """
+        Changing the name, even with update_fields, should link a new embedding.
+        """
+        person = create_person("jack-roy", "Jack", "Roy")
+        old_embedding_id = person.name_embedding_id
+        person.first_name = "John"
+        person.save(update_fields=["first_name"])
+        person.refresh_from_db()
+        self.assertNotEqual(person.name_embedding_id, old_embedding_id)
+
+    def test_model_change_relinks_on_save(self):
+        """
+        Saving after the model version changed should link the current model's embedding, keeping the
+        person searchable, even though the name is unchanged.
+        """
+        person = create_person("jack-roy", "Jack", "Roy")
+        with override_settings(EMBEDDING_MODEL_VERSION=2):
+            person = Person.objects.get(pk=person.pk)
+            person.save()
+            self.assertEqual(person.name_embedding.model_name, get_embedding_model_id())
+            self.assertEqual(find_similar_persons("Jack Roy").get(), person)
+
+    def test_reembed_persons_command(self):
+        """
+        The command should link every person to the current model's embeddings in batches.
+        """
+        for i in range(3):
+            create_person(f"jack-{i}", "Jack", f"Roy{i}")
+        with override_settings(EMBEDDING_MODEL_VERSION=2):
+            out = StringIO()
+            call_command("reembed_persons", batch_size=2, stdout=out)
+            self.assertIn("Re-embedded 3 persons", out.getvalue())
+            self.assertFalse(Person.objects.exclude(name_embedding__model_name=get_embedding_model_id()).exists())
+
+
+@override_settings(EMBEDDING_BACKEND="hashing")
+class EmbeddingDeferralTests(TemporaryMediaRootMixin, APITestCase):
+    """
+    Test cases ensuring name vectors are only read by the vector search path.
+    """
+    def setUp(self):
+        self.person = Person.objects.create_user(
+            username="vera",
+            first_name="Vera",
+            last_name="Lynn",
+            password="verapassword",
+            email="vera@example.com",
+            phone="5551234567",
+            date_of_birth=date(1990, 3, 20),
+            role=Role.ADMIN,
+        )
+
+    def test_api_requests_do_not_read_vectors(self):
+        """
+        Login, token authentication, list, retrieve and update should never select the vector text.
+        """
+        with forbid_vector_reads(self):
+            response = self.client.post(reverse("profiles:login"), {"username": "vera", "password": "verapassword"})
+            self.client.credentials(HTTP_AUTHORIZATION=f"Token {response.data['token']}")
+            self.client.get(reverse("profiles:person-list"))
+            url = reverse("profiles:person-detail", args=[self.person.id])
+            self.client.get(url)
+            response = self.client.patch(url, {"first_name": "Veronica"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_admin_does_not_read_vectors(self):
+        """
+        The admin changelist and change form should never select the vector text.
+        """
+        self.person.is_staff = self.person.is_superuser = True
+        self.person.save()
+        self.client.force_login(self.person)
+        with forbid_vector_reads(self):
+            self.client.get(reverse("admin:profiles_person_changelist"))
+            response = self.client.get(reverse("admin:profiles_person_change", args=[self.person.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_vectors_are_opt_in(self):
+        """
+        Vectors should be deferred by default and loaded by with_vectors / with_embeddings.
+        """
+        self.assertIn("vector", NameEmbedding.objects.get().get_deferred_fields())
+        self.assertIn("vector", Person.objects.get(id=self.person.id).name_embedding.get_deferred_fields())
+        self.assertEqual(NameEmbedding.objects.with_vectors().get().get_deferred_fields(), set())
+        person = Person.objects.with_embeddings().get(id=self.person.id)
+        with self.assertNumQueries(0):
+            self.assertTrue(json.loads(person.name_embedding.vector))
+
+        with CaptureQueriesContext(connection) as queries:
+            person_ids, _ = load_person_embeddings()
+        self.assertEqual(person_ids, (self.person.id,))
+        self.assertTrue(any('"profiles_nameembedding"."vector"' in query["sql"] for query in queries))
+
+
+@override_settings(EMBEDDING_BACKEND="hashing")
+class PhoneticKeyTests(TestCase):
+    """
+    Test cases for Soundex phonetic keys and their backfill command.
+    """
+    def test_soundex(self):
+        """
+        Sound-alike names should share a Soundex code.
+        """
+        self.assertEqual(soundex("Smith"), soundex("Smyth"))
+        self.assertEqual(soundex("Jon"), soundex("John"))
+        self.assertEqual(soundex("Robert"), "R163")
+        self.assertEqual(soundex("Ashcraft"), "A261")
+        self.assertEqual(soundex(""), "")
+
+    def test_backfill_phonetic_keys(self):
+        """
+        The backfill command should fill keys of persons created without them.
+        """
+        call_command("seed_persons", 5, stdout=StringIO())
+        Person.objects.update(first_name_phonetic="", last_name_phonetic="")
+        call_command("backfill_phonetic_keys", batch_size=2, stdout=StringIO())
+        for person in Person.objects.all():
+            self.assertEqual(person.first_name_phonetic, soundex(person.first_name))
+            self.assertEqual(person.last_name_phonetic, soundex(person.last_name))
+
+
+@override_settings(EMBEDDING_BACKEND="hashing")
+class PersonAdminTests(TestCase):
+    """
+    Test cases for the Person admin changelist, search and bulk actions.
+    """
+    def setUp(self):
+        self.admin = Person.objects.create_superuser(
+            username="root",
+            email="root@example.com",
+            phone="5550001111",
+            date_of_birth=date(1980, 1, 1),
+            password="rootpassword",
+        )
+        call_command("seed_persons", 30, seed=5, stdout=StringIO())
+        self.client.force_login(self.admin)
+        self.url = reverse("admin:profiles_person_changelist")
+
+    def test_changelist_search_by_phone_prefix(self):
+        """
+        Searching a phone prefix should return the persons whose phone starts with it.
+        """
+        response = self.client.get(self.url, {"q": "555000"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(response.context["cl"].result_list), [self.admin])
+
+    def test_changelist_search_by_exact_email(self):
+        """
+        Searching a full email should return the matching person.
+        """
+        response = self.client.get(self.url, {"q": "seed3@example.com"})
+        self.assertEqual([person.username for person in response.context["cl"].result_list], ["seed3"])
+
+    def test_estimated_count_paginator(self):
+        """
+        Unfiltered querysets should use table statistics once they are large enough.
+        """
+        with mock.patch.object(EstimatedCountPaginator, "estimate_table_rows", return_value=123456):
+            self.assertEqual(EstimatedCountPaginator(Person.objects.order_by("id"), 10).count, 123456)
+            admins = Person.objects.filter(role=Role.ADMIN).order_by("id")
+            self.assertEqual(EstimatedCountPaginator(admins, 10).count, admins.count())
+        with mock.patch.object(EstimatedCountPaginator, "estimate_table_rows", return_value=None):
+            self.assertEqual(EstimatedCountPaginator(Person.objects.order_by("id"), 10).count, 31)
+
+    def test_re_embed_action(self):
+        """
+        The re-embed action should relink selected persons to current-model embeddings.
+        """
+        selected = list(Person.objects.filter(username__startswith="seed").values_list("id", flat=True)[:5])
+        response = self.client.post(self.url, {"action": "re_embed_persons", "_selected_action": selected})
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        model_ids = set(Person.objects.filter(id__in=selected).values_list("name_embedding__model_name", flat=True))
+        self.assertEqual(model_ids, {NameEmbedding.objects.get(persons=self.admin).model_name})
+
+    def test_export_action(self):
+        """
+        The export action should stream a CSV row per selected person.
+        """
+        selected = list(Person.objects.values_list("id", flat=True)[:3])
+        response = self.client.post(self.url, {"action": "export_persons_csv", "_selected_action": selected})
+        rows = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(rows[0].split(",")[:2], ["id", "username"])
+        self.assertEqual(len(rows), 4)
@@ -1,59 +1,283 @@
+import hashlib
 import json
 import os
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
 
 from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Case, FloatField, IntegerField, Value, When
 
 import faiss
 import numpy as np
-from sentence_transformers import SentenceTransformer
 
-# Load model globally once
-EMBEDDING_MODEL = SentenceTransformer("all-MiniLM-L6-v2")
+from profiles.embedding_backends import get_embedding_backend
+from profiles.vector_index import get_active_vector_index
+
+# Inference runtimes selectable through settings.EMBEDDING_RUNTIME
+EMBEDDING_RUNTIMES = ("torch", "onnx", "onnx-int8")
+
+# Threads encoding search queries concurrently with request database work
+QUERY_ENCODER_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="query-encoder")
+
+# Default, minimum and maximum search threshold per similarity metric: the maximum squared L2
+# distance between unit vectors (0 to 4), or the minimum cosine similarity (-1 to 1)
+SIMILARITY_THRESHOLDS = {"l2": (1.0, 0.0, 4.0), "cosine": (0.5, -1.0, 1.0)}
+
+# Rank offset of reciprocal-rank fusion; larger values flatten the gap between top ranks
+RRF_K = 60
 
 
 def get_embedding_model():
-    """Returns the globally loaded model instance."""
-    return EMBEDDING_MODEL
+    """Returns the model instance for the configured runtime, loaded once per process."""
+    return load_embedding_model(settings.EMBEDDING_RUNTIME)
+
+
+def get_embedding_model_id():
+    """
+    Identifies the vectors produced by the configured backend (model, runtime) and version.
+    Stored embeddings with a different id are not comparable with fresh ones.
+    """
+    return get_embedding_backend().model_id
+
+
+def normalize_name(name):
+    """Case-folds a name and collapses whitespace so equivalent names share one embedding."""
+    return " ".join(name.casefold().split())
+
+
+def get_name_embedding_key(normalized_name, model_id):
+    """Returns the NameEmbedding key for a normalized name under the given model id."""
+    return hashlib.sha256(f"{model_id}\n{normalized_name}".encode()).hexdigest()
+
+
+# American Soundex digit for each consonant group; vowels, h, w and y have none
+SOUNDEX_CODES = {
+    **dict.fromkeys("bfpv", "1"),
+    **dict.fromkeys("cgjkqsxz", "2"),
+    **dict.fromkeys("dt", "3"),
+    "l": "4",
+    **dict.fromkeys("mn", "5"),
+    "r": "6",
+}
+
+
+def soundex(name):
+    """
+    Returns the 4-character American Soundex code of `name` (e.g. "Smith" and "Smyth" -> "S530"),
+    or an empty string when it has no ASCII letters.
+    """
+    letters = [
+        char for char in unicodedata.normalize("NFKD", name).casefold() if "a" <= char <= "z"
+    ]
+    if not letters:
+        return ""
+
+    code = letters[0].upper()
+    previous = SOUNDEX_CODES.get(letters[0], "")
+    for char in letters[1:]:
+        digit = SOUNDEX_CODES.get(char, "")
+        if digit and digit != previous:
+            code += digit
+        if char not in "hw":  # h and w do not separate letters with the same code
+            previous = digit
+    return (code + "000")[:4]
+
+
+def encode_names(names):
+    """Encodes names in batches with the configured EMBEDDING_BACKEND, returning one vector per name."""
+    return get_embedding_backend().encode_many(names)
+
+
+@lru_cache(maxsize=None)
+def load_embedding_model(runtime):
+    """
+    Loads settings.EMBEDDING_MODEL_NAME with the given runtime.
+
+    ONNX models are exported (and int8 models quantized) on first use and cached under
+    settings.EMBEDDING_MODEL_CACHE_DIR, so later processes load the converted files directly.
+    """
+    if runtime not in EMBEDDING_RUNTIMES:
+        raise ImproperlyConfigured(
+            f"EMBEDDING_RUNTIME must be one of {', '.join(EMBEDDING_RUNTIMES)}, got {runtime!r}."
+        )
+    from sentence_transformers import SentenceTransformer  # Imported on first use; other backends skip torch
+
+    model_name = settings.EMBEDDING_MODEL_NAME
+    if runtime == "torch":
+        return SentenceTransformer(model_name, backend="torch")
+
+    onnx_dir = Path(settings.EMBEDDING_MODEL_CACHE_DIR) / f"{Path(model_name).name}-onnx"
+    if (onnx_dir / "onnx" / "model.onnx").exists():
+        onnx_model = SentenceTransformer(str(onnx_dir), backend="onnx")
+    else:
+        onnx_model = SentenceTransformer(model_name, backend="onnx")  # Exports to ONNX if the hub has no export
+        onnx_model.save(str(onnx_dir))
+    if runtime == "onnx":
+        return onnx_model
+
+    config = settings.EMBEDDING_QUANTIZATION_CONFIG
+    file_name = f"onnx/model_qint8_{config}.onnx"
+    if not (onnx_dir / file_name).exists():
+        from sentence_transformers import export_dynamic_quantized_onnx_model
+
+        export_dynamic_quantized_onnx_model(onnx_model, config, str(onnx_dir))
+    return SentenceTransformer(str(onnx_dir), backend="onnx", model_kwargs={"file_name": file_name})
+
+
+def get_index_factory_string(dimension, num_vectors, pca_dim=None, quantizer=None, pq_m=16):
+    """
+    Returns the FAISS index_factory description for the given compression.
+
+    PCA to `pca_dim` dimensions (renormalized) and the `quantizer` ("sq8" or "pq" with `pq_m` sub-quantizers) are
+    skipped while there are too few vectors to train them, falling back to an exact "Flat" index.
+    """
+    stages = []
+
+    if pca_dim and pca_dim < dimension and num_vectors > pca_dim:
+        stages.extend([f"PCA{pca_dim}", "L2norm"])  # Keep reduced vectors unit length for cosine scores
+        dimension = pca_dim
+
+    if quantizer == "sq8":
+        stages.append("SQ8")
+    elif quantizer == "pq" and num_vectors >= 256:  # 8-bit PQ trains 256 centroids per sub-quantizer
+        if dimension % pq_m:
+            raise ImproperlyConfigured(f"PQ sub-quantizers ({pq_m}) must divide the vector dimension ({dimension}).")
+        stages.append(f"PQ{pq_m}")
+    elif quantizer not in (None, "sq8", "pq"):
+        raise ImproperlyConfigured(f"Vector quantizer must be None, 'sq8' or 'pq', got {quantizer!r}.")
+    else:
+        stages.append("Flat")
+
+    return ",".join(stages)
+
+
+def get_configured_index_factory_string(embeddings):
+    """Returns the index_factory description for `embeddings` under the VECTOR_INDEX_* settings."""
+    return get_index_factory_string(
+        embeddings.shape[1],
+        len(embeddings),
+        pca_dim=settings.VECTOR_INDEX_PCA_DIM,
+        quantizer=settings.VECTOR_INDEX_QUANTIZER,
+        pq_m=settings.VECTOR_INDEX_PQ_M,
+    )
+
+
+def train_faiss_index(embeddings, factory_string="Flat"):
+    """
+    Returns an empty L2 index with its PCA/quantization stages (if any) trained on `embeddings`.
+    """
+    index = faiss.index_factory(embeddings.shape[1], factory_string, faiss.METRIC_L2)
+    if not index.is_trained:
+        index.train(embeddings)
+    return index
+
+
+def build_faiss_index(embeddings, factory_string="Flat"):
+    """
+    Trains (when compressed) and fills an L2 index. Query vectors are passed through the same
+    PCA/quantization stages by FAISS, so search calls need no extra handling.
+    """
+    index = train_faiss_index(embeddings, factory_string)
+    index.add(embeddings)
+    return index
 
 
 def load_faiss_index(embeddings):
     """
     Loads FAISS index if available, otherwise creates and saves a new index.
+
+    The file name carries the compression stages and embedding model id, and the index is rebuilt
+    when its fingerprint file no longer matches `embeddings` (vectors changed, added or removed).
     """
     os.makedirs(settings.MEDIA_ROOT, exist_ok=True)  # Ensure MEDIA_ROOT exists
-    FAISS_INDEX_PATH = os.path.join(settings.MEDIA_ROOT, "faiss_index.idx")  # FAISS index path
+    factory_string = get_configured_index_factory_string(embeddings)
+    suffix = "" if factory_string == "Flat" else "_" + factory_string.replace(",", "_")
+    suffix += "_" + hashlib.sha256(get_embedding_model_id().encode()).hexdigest()[:8]  # One file per backend
+    FAISS_INDEX_PATH = os.path.join(settings.MEDIA_ROOT, f"faiss_index{suffix}.idx")  # FAISS index path
 
-    if os.path.exists(FAISS_INDEX_PATH):
-        index = faiss.read_index(FAISS_INDEX_PATH)
-    else:
-        index = faiss.IndexFlatL2(embeddings.shape[1])  # L2 distance index
-        index.add(embeddings)
-        faiss.write_index(index, FAISS_INDEX_PATH)
+    fingerprint_path = f"{FAISS_INDEX_PATH}.fingerprint"
+    fingerprint = hashlib.blake2b(embeddings.tobytes(), digest_size=16).hexdigest()
 
+    if os.path.exists(FAISS_INDEX_PATH) and os.path.exists(fingerprint_path):
+        with open(fingerprint_path) as fingerprint_file:
+            if fingerprint_file.read() == fingerprint:
+                return faiss.read_index(FAISS_INDEX_PATH)
+
+    index = build_faiss_index(embeddings, factory_string)
+    faiss.write_index(index, FAISS_INDEX_PATH)
+    with open(fingerprint_path, "w") as fingerprint_file:
+        fingerprint_file.write(fingerprint)
     return index
 
 
-def find_similar_persons(name, top_k=5, threshold=1):
-    from profiles.models import Person  # Delayed import to prevent circular import issue
+def load_person_embeddings(updated_after=None):
+    """
+    Returns (person_ids, embeddings) for every Person with an embedding from the current model
+    (only those updated after `updated_after` when given), ordered by id so positions stay stable
+    between calls. Each shared name vector is parsed once, and rows are scaled to unit length like
+    encode_query() vectors, so L2 distances map to cosine similarities whatever the backend.
+    """
+    from profiles.models import NameEmbedding, Person  # Delayed import to prevent circular import issue
+
+    model_id = get_embedding_model_id()
+    persons = Person.objects.filter(name_embedding__model_name=model_id)
+    if updated_after is not None:
+        persons = persons.filter(updated_at__gt=updated_after)
+    persons = persons.order_by("id").values_list("id", "name_embedding_id")
+    if not persons:
+        return (), np.empty((0, 0), dtype="float32")
 
+    person_ids, embedding_ids = zip(*persons)
+    # A small delta passes its ids directly; a full load uses a subquery instead of a huge IN list
+    linked_ids = set(embedding_ids) if updated_after is not None else Person.objects.values("name_embedding_id")
+    embeddings = NameEmbedding.objects.with_vectors().filter(model_name=model_id, id__in=linked_ids)
+    vectors = {embedding_id: json.loads(vector) for embedding_id, vector in embeddings.values_list("id", "vector")}
+    embeddings = np.array([vectors[embedding_id] for embedding_id in embedding_ids], dtype="float32")
+    faiss.normalize_L2(embeddings)
+    return person_ids, embeddings
+
+
+def encode_query(name):
     """
-    Finds similar persons based on first_name + last_name embeddings using FAISS.
+    Encodes a search name into a (1, dimension) unit-length float32 array, or returns None if
+    encoding fails.
     """
     try:
-        # Generate an embedding vector for the given name using the embedding model.
-        embedding_model = get_embedding_model()
-        embedding_vector = (np.array(embedding_model.encode(name), dtype="float32")).reshape(1, -1)
+        # Generate an embedding vector for the given name using the embedding backend.
+        vector = np.array(encode_names([normalize_name(name)]), dtype="float32").reshape(1, -1)
     except Exception:
-        return []  # If the embedding model fails to load or encoding fails, return an empty list.
+        return None  # The embedding model failed to load or encoding failed
+    faiss.normalize_L2(vector)  # Backends are not required to return unit vectors
+    return vector
+
+
+def encode_query_async(name):
+    """
+    Starts encode_query(name) on a worker thread and returns its Future, so callers can run
+    database work while the model runs (PyTorch/ONNX release the GIL during inference).
+    """
+    return QUERY_ENCODER_POOL.submit(encode_query, name)
 
-    # Fetch persons and their embeddings
-    persons = Person.objects.exclude(embedding__isnull=True).exclude(embedding="").values_list("id", "embedding")
-    if not persons:
-        return []  # If no persons with embeddings are found, return an empty list.
 
-    # Convert stored JSON embeddings to numpy array
-    person_ids, embeddings = zip(*persons)
-    embeddings = np.array([json.loads(e) for e in embeddings], dtype="float32")
+def search_similar_person_ids(embedding_vector, top_k=5, threshold=1):
+    """
+    Returns [(person_id, distance)] of the nearest persons to `embedding_vector`, closest first,
+    keeping only distances <= threshold.
+
+    Uses the memory-mapped artifact from `build_vector_index` when one exists for the current model,
+    plus a search over persons updated since it was built; otherwise builds an index in place.
+    """
+    artifact = get_active_vector_index()
+    if artifact is not None and artifact.manifest["model_id"] == get_embedding_model_id():
+        return search_vector_index_artifact(artifact, embedding_vector, top_k, threshold)
+
+    # Fetch persons and their embeddings as a numpy array
+    person_ids, embeddings = load_person_embeddings()
+    if not person_ids:
+        return []  # If no persons with embeddings are found, return an empty list.
 
     # Load FAISS index
     index = load_faiss_index(embeddings)
@@ -62,6 +286,86 @@ def find_similar_persons(name, top_k=5, threshold=1):
     distances, indices = index.search(embedding_vector, k=min(top_k, len(person_ids)))
 
     # Apply threshold filter and extract valid person IDs
-    person_ids = [person_ids[i] for d, i in zip(distances[0], indices[0]) if d <= threshold and i >= 0]
+    return [(person_ids[i], float(d)) for d, i in zip(distances[0], indices[0]) if d <= threshold and i >= 0]
+
+
+def search_vector_index_artifact(artifact, embedding_vector, top_k, threshold):
+    """
+    search_similar_person_ids() on a built artifact. Persons updated since the build are scored
+    through the artifact's own PCA/quantization stages, so their distances rank with the artifact's.
+    Artifact entries of persons deleted or updated since the build are dropped before truncating,
+    fetching more neighbours until `top_k` remain or none are left within the threshold.
+    """
+    from profiles.models import Person  # Delayed import to prevent circular import issue
+
+    recent_ids, recent_embeddings = load_person_embeddings(updated_after=artifact.max_updated_at)
+    matches = {}
+    if recent_ids:
+        distances = artifact.score(embedding_vector, recent_embeddings)
+        matches.update((person_id, d) for person_id, d in zip(recent_ids, distances) if d <= threshold)
+
+    unchanged = Person.objects.all()
+    if artifact.max_updated_at is not None:
+        unchanged = unchanged.filter(updated_at__lte=artifact.max_updated_at)
+    k = top_k + len(recent_ids)  # Stale entries of the updated persons may take slots
+    while True:
+        hits = artifact.search(embedding_vector, k)
+        candidates = [(person_id, d) for person_id, d in hits if d <= threshold]
+        live = set(unchanged.filter(id__in=[person_id for person_id, _ in candidates]).values_list("id", flat=True))
+        found = [(person_id, d) for person_id, d in candidates if person_id in live]
+        if len(found) >= top_k or len(candidates) < k or k >= artifact.index.ntotal:
+            break
+        k *= 2
 
-    return Person.objects.filter(id__in=person_ids)
+    matches.update(found)
+    return sorted(matches.items(), key=lambda match: match[1])[:top_k]
+
+
+def find_similar_persons(name, top_k=5, threshold=1, metric="l2"):
+    """
+    Finds similar persons based on first_name + last_name embeddings using FAISS.
+
+    Returns a queryset ordered by similarity and annotated with `score`: the squared L2 distance
+    (lower is closer) for metric="l2", or the cosine similarity of the normalized vectors (higher is
+    closer) for metric="cosine". `threshold` is the maximum distance or minimum similarity.
+    """
+    from profiles.models import Person  # Delayed import to prevent circular import issue
+
+    embedding_vector = encode_query(name)
+    if embedding_vector is None:
+        return Person.objects.none()  # If the embedding model fails to load or encoding fails, return no persons.
+
+    # Query and indexed vectors are unit length, so squared L2 distance d and cosine similarity c
+    # are related by d = 2 - 2c
+    max_distance = threshold if metric == "l2" else 2 * (1 - threshold)
+    matches = search_similar_person_ids(embedding_vector, top_k, max_distance)
+    if not matches:
+        return Person.objects.none()
+
+    scores = {person_id: distance if metric == "l2" else 1 - distance / 2 for person_id, distance in matches}
+    return (
+        Person.objects.filter(id__in=scores)
+        .annotate(
+            score=Case(
+                *[When(id=person_id, then=Value(score)) for person_id, score in scores.items()],
+                output_field=FloatField(),
+            ),
+            similarity_rank=Case(
+                *[When(id=person_id, then=Value(rank)) for rank, person_id in enumerate(scores)],
+                output_field=IntegerField(),
+            ),
+        )
+        .order_by("similarity_rank")
+    )
+
+
+def reciprocal_rank_fusion(rankings, weights, k=RRF_K):
+    """
+    Fuses ranked id lists into {id: score} with weighted reciprocal-rank fusion:
+    score(id) = sum(weight / (k + rank)) over the rankings containing id, with ranks starting at 1.
+    """
+    scores = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + weight / (k + rank)
+    return scores
@@ -0,0 +1,184 @@
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Max
+from django.utils import timezone
+
+import faiss
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Pointer file naming the active artifact version inside settings.VECTOR_INDEX_DIR
+CURRENT_POINTER = "CURRENT"
+
+# Zero-copy memory mapping of flat/SQ/PQ codes, so workers share the page cache instead of private
+# copies. IO_FLAG_MMAP alone only maps on-disk IVF lists, so older FAISS releases are refused.
+if not hasattr(faiss, "IO_FLAG_MMAP_IFC"):
+    raise ImproperlyConfigured(
+        f"faiss {faiss.__version__} cannot memory-map index codes; install faiss-cpu>=1.11.0 (see requirements.txt)."
+    )
+MMAP_READ_FLAGS = faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY
+
+
+class VectorIndexArtifact:
+    """
+    A loaded, read-only index version: FAISS index, position -> person id map and manifest.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "manifest.json")) as manifest:
+            self.manifest = json.load(manifest)
+        self.version = self.manifest["version"]
+        self.index = faiss.read_index(os.path.join(path, "index.faiss"), MMAP_READ_FLAGS)
+        self.person_ids = np.load(os.path.join(path, "ids.npy"), mmap_mode="r")
+        self.max_updated_at = (
+            datetime.fromisoformat(self.manifest["max_updated_at"]) if self.manifest["max_updated_at"] else None
+        )
+        self.trained_index = None  # Empty index with the artifact's trained stages, read on first score()
+
+    def search(self, embedding_vector, top_k):
+        """Returns [(person_id, distance)] of the `top_k` nearest stored vectors, closest first."""
+        distances, indices = self.index.search(embedding_vector, k=min(top_k, self.index.ntotal))
+        return [(int(self.person_ids[i]), float(d)) for d, i in zip(distances[0], indices[0]) if i >= 0]
+
+    def score(self, embedding_vector, vectors):
+        """
+        Returns the distances from `embedding_vector` to each of `vectors` as this index measures them
+        (through its PCA/quantization stages), comparable with search() distances.
+        """
+        if self.trained_index is None:
+            trained_path = os.path.join(self.path, "trained.faiss")
+            if os.path.exists(trained_path):
+                self.trained_index = faiss.read_index(trained_path)
+            else:  # Versions built before trained.faiss: a private copy, as mapped codes cannot be reset
+                self.trained_index = faiss.read_index(os.path.join(self.path, "index.faiss"))
+                self.trained_index.reset()
+        index = faiss.clone_index(self.trained_index)
+        index.add(vectors)
+        distances, indices = index.search(embedding_vector, k=len(vectors))
+        scores = np.full(len(vectors), np.inf, dtype="float32")
+        scores[indices[0][indices[0] >= 0]] = distances[0][indices[0] >= 0]
+        return scores.tolist()
+
+
+def build_vector_index(keep=3):
+    """
+    Build a new index version from the stored embeddings, publish it atomically and prune old versions.
+
+    The artifact is written to a temporary directory and renamed into place before the CURRENT
+    pointer is replaced, so readers never observe a partial version.
+    """
+    from profiles.models import Person  # Delayed import to prevent circular import issue
+    from profiles.utils import (
+        get_configured_index_factory_string,
+        get_embedding_model_id,
+        load_person_embeddings,
+        train_faiss_index,
+    )
+
+    root = str(settings.VECTOR_INDEX_DIR)
+    os.makedirs(root, exist_ok=True)
+
+    # Read the high-water mark first: rows updated while loading are then re-checked as delta rows
+    max_updated_at = Person.objects.aggregate(max_updated_at=Max("updated_at"))["max_updated_at"]
+    person_ids, embeddings = load_person_embeddings()
+    if not person_ids:
+        return None
+
+    factory_string = get_configured_index_factory_string(embeddings)
+    index = train_faiss_index(embeddings, factory_string)
+
+    version = f"{timezone.now():%Y%m%dT%H%M%S%fZ}-{uuid.uuid4().hex[:8]}"  # Sorts by build time
+    staging = os.path.join(root, f".{version}.tmp")
+    os.makedirs(staging)
+    faiss.write_index(index, os.path.join(staging, "trained.faiss"))  # Scores rows updated after the build
+    index.add(embeddings)
+    faiss.write_index(index, os.path.join(staging, "index.faiss"))
+    np.save(os.path.join(staging, "ids.npy"), np.asarray(person_ids, dtype="int64"))
+    manifest = {
+        "version": version,
+        "model_id": get_embedding_model_id(),
+        "factory": factory_string,
+        "dimension": int(embeddings.shape[1]),
+        "row_count": len(person_ids),
+        "max_updated_at": max_updated_at.isoformat() if max_updated_at else None,
+        "created_at": timezone.now().isoformat(),
+    }
+    with open(os.path.join(staging, "manifest.json"), "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+
+    os.rename(staging, os.path.join(root, version))
+    pointer = os.path.join(root, f".{CURRENT_POINTER}.{version}.tmp")
+    with open(pointer, "w") as pointer_file:
+        pointer_file.write(version)
+    os.replace(pointer, os.path.join(root, CURRENT_POINTER))  # Atomic switch for every worker
+
+    # Workers still using an old version keep their mapping; unlinked files stay readable until unmapped
+    # The version just published is always kept, even if a concurrent build sorts after it
+    versions = sorted(
+        name for name in os.listdir(root) if not name.startswith(".") and name not in (CURRENT_POINTER, version)
+    )
+    for old_version in versions[:max(len(versions) - keep + 1, 0)]:
+        shutil.rmtree(os.path.join(root, old_version), ignore_errors=True)
+
+    return manifest
+
+
+def read_current_version():
+    """Returns the version named by the CURRENT pointer, or None before the first build."""
+    try:
+        with open(os.path.join(str(settings.VECTOR_INDEX_DIR), CURRENT_POINTER)) as pointer:
+            return pointer.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+class ActiveVectorIndex:
+    """
+    Per-process holder of the current artifact.
+
+    The pointer is re-read at most every settings.VECTOR_INDEX_CHECK_INTERVAL seconds. A new version
+    is loaded beside the old one and swapped in by replacing a single reference, so queries that
+    already hold the old artifact finish against it undisturbed.
+    """
+    def __init__(self):
+        self.artifact = None
+        self.root = None
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+
+    def get(self):
+        root = str(settings.VECTOR_INDEX_DIR)
+        if root == self.root and time.monotonic() - self.checked_at < settings.VECTOR_INDEX_CHECK_INTERVAL:
+            return self.artifact
+
+        with self.lock:
+            if root != self.root:
+                self.artifact, self.root = None, root
+            version = read_current_version()
+            if version is None:
+                self.artifact = None
+            elif self.artifact is None or self.artifact.version != version:
+                try:
+                    self.artifact = VectorIndexArtifact(os.path.join(root, version))
+                except (OSError, RuntimeError, KeyError, ValueError):
+                    logger.exception("Could not load vector index version %s, keeping the previous one", version)
+            self.checked_at = time.monotonic()
+        return self.artifact
+
+
+ACTIVE_VECTOR_INDEX = ActiveVectorIndex()
+
+
+def get_active_vector_index():
+    """Returns the current VectorIndexArtifact of this process, or None when none is built."""
+    return ACTIVE_VECTOR_INDEX.get()
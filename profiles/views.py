@@ -1,19 +1,37 @@
-from datetime import date, timedelta
+from datetime import timedelta
 
+from django.conf import settings
 from django.contrib.auth import authenticate
-from django.db.models import Q
+from django.db.models import Case, Prefetch, Q, Value, When
+from django.utils import timezone
 
 from rest_framework import status, views, viewsets
 from rest_framework.authtoken.models import Token
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 
-from profiles.models import Person
-from profiles.pagination import StandardResultsSetPagination
+from profiles.autocomplete import MAX_SUGGESTIONS, NAME_PREFIX_INDEX
+from profiles.middleware import QueryBudget
+from profiles.models import DuplicateCluster, Person, PersonTombstone
+from profiles.pagination import StandardResultsSetPagination, decode_change_cursor, encode_change_cursor
 from profiles.permissions import IsAdminOrGuestUser, IsAdminUser
-from profiles.serializers import PersonSearchSerializer, PersonSerializer
-from profiles.utils import find_similar_persons
+from profiles.serializers import (
+    DuplicateClusterSerializer,
+    PersonSearchSerializer,
+    PersonSerializer,
+    PersonSimilaritySerializer,
+)
+from profiles.stats import read_person_stats
+from profiles.utils import (
+    SIMILARITY_THRESHOLDS,
+    encode_query_async,
+    find_similar_persons,
+    reciprocal_rank_fusion,
+    search_similar_person_ids,
+    soundex,
+)
 
 
 class LoginView(views.APIView):
@@ -21,6 +39,7 @@ class LoginView(views.APIView):
     API endpoint to authenticate a user and return an auth token.
     """
     permission_classes = [AllowAny]
+    query_budgets = {"post": QueryBudget(queries=5, rows=2)}  # Checked by QueryBudgetMiddleware
 
     def post(self, request):
         username = request.data.get("username")
@@ -42,49 +61,358 @@ class PersonViewSet(viewsets.ModelViewSet):
     serializer_class = PersonSerializer
     pagination_class = StandardResultsSetPagination
 
+    # Per-action limits checked by QueryBudgetMiddleware; they must not grow with the table size.
+    # Rows are fetched database rows, including the token and user loaded by authentication. Writes
+    # include their BEGIN and COMMIT.
+    query_budgets = {
+        "list": QueryBudget(queries=5, rows=400),  # Up to 100 persons with prefetched groups/permissions
+        "retrieve": QueryBudget(queries=4, rows=50),
+        "create": QueryBudget(queries=12, rows=10),  # Including two to update the statistics counters
+        "update": QueryBudget(queries=11, rows=50),
+        "partial_update": QueryBudget(queries=11, rows=50),
+        "destroy": QueryBudget(queries=12, rows=50),
+        "search": QueryBudget(queries=2),  # Unpaginated, rows grow with the matches
+        "vector_search": QueryBudget(queries=5, rows=110),  # One more to drop stale artifact entries
+        "hybrid_search": QueryBudget(queries=6, rows=110),
+        "changes": QueryBudget(queries=5),  # Rows bounded by `limit`, plus prefetched groups/permissions
+        "duplicates": QueryBudget(queries=4),  # Rows grow with the cluster sizes
+        "autocomplete": QueryBudget(queries=2),  # Served from memory; a rebuild fetches every distinct name
+        "stats": QueryBudget(queries=2, rows=300),  # One row per counter or age bucket, whatever the number of persons
+    }
+
+    def get_queryset(self):
+        """
+        Annotate age in SQL; the list additionally supports age range filters and ordering.
+        """
+        queryset = super().get_queryset().with_age()
+        if self.action == "list":
+            queryset = self.order_by_params(self.filter_by_age_params(queryset))
+        if self.action in ("list", "retrieve"):
+            queryset = self.select_serialized_columns(queryset, PersonSerializer)
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        if self.action in ("list", "retrieve"):
+            kwargs.setdefault("fields", self.get_sparse_fieldset(self.get_serializer_class()))
+        return super().get_serializer(*args, **kwargs)
+
+    def get_sparse_fieldset(self, serializer_class):
+        """
+        Readable fields of `serializer_class` selected by the comma-separated `fields` and `exclude`
+        query parameters, or None when neither is given.
+        """
+        fields_param = self.request.query_params.get("fields", "")
+        exclude_param = self.request.query_params.get("exclude", "")
+        if not fields_param and not exclude_param:
+            return None
+
+        readable = [name for name, field in serializer_class().fields.items() if not field.write_only]
+        fields = {name.strip() for name in fields_param.split(",") if name.strip()} or set(readable)
+        excluded = {name.strip() for name in exclude_param.split(",") if name.strip()}
+        unknown = sorted((fields | excluded).difference(readable))
+        if unknown:
+            raise ValidationError({"error": f"Unknown fields: {', '.join(unknown)}"})
+        return [name for name in readable if name in fields and name not in excluded]
+
+    def select_serialized_columns(self, queryset, serializer_class):
+        """
+        Load only the columns behind the serialized fields, and prefetch many-to-many fields only
+        when they are serialized.
+        """
+        serializer = serializer_class(fields=self.get_sparse_fieldset(serializer_class))
+        model_fields = {field.name: field for field in Person._meta.get_fields()}
+        columns, prefetches = ["id"], []
+        for field in serializer.fields.values():
+            model_field = model_fields.get(field.source)
+            if field.write_only or model_field is None:
+                continue  # Computed values such as age come from annotations
+            (prefetches if model_field.many_to_many else columns).append(field.source)
+        return queryset.only(*columns).prefetch_related(*prefetches)
+
+    def filter_by_age_params(self, queryset):
+        """
+        Apply the `age`, `age_min` and `age_max` query parameters as a date_of_birth range.
+        """
+        ages = {}
+        for param in ("age", "age_min", "age_max"):
+            value = self.request.query_params.get(param)
+            if value:
+                try:
+                    ages[param] = int(value)
+                except ValueError:
+                    message = "Age must be an integer" if param == "age" else f"{param} must be an integer"
+                    raise ValidationError({"error": message})
+
+        age_min = ages.get("age", ages.get("age_min"))
+        age_max = ages.get("age", ages.get("age_max"))
+        return queryset.filter_by_age(age_min=age_min, age_max=age_max)
+
+    def order_by_params(self, queryset):
+        """
+        Apply the `ordering` query parameter (`age` or `-age`), defaulting to id order.
+        """
+        ordering = self.request.query_params.get("ordering")
+        if not ordering:
+            return queryset.order_by("id")
+        if ordering not in ("age", "-age"):
+            raise ValidationError({"error": "ordering must be one of: age, -age"})
+        return queryset.order_by_age(descending=ordering == "-age")
+
     @action(detail=False, methods=["get"], permission_classes=[IsAdminOrGuestUser])
     def search(self, request):
         """
-        Filter persons by first_name, last_name (partial match) and/or age.
+        Filter persons by first_name, last_name (partial match, or sound-alike with fuzzy=phonetic)
+        and/or age (exact or range). `fields` / `exclude` limit the returned fields.
         """
         first_name = request.query_params.get('first_name', '')
         last_name = request.query_params.get('last_name', '')
-        age = request.query_params.get('age', None)
+        fuzzy = request.query_params.get('fuzzy', '')
 
-        filters = Q()
+        if fuzzy not in ('', 'phonetic'):
+            return Response({'error': 'fuzzy must be one of: phonetic'}, status=status.HTTP_400_BAD_REQUEST)
 
-        if first_name:
-            filters |= Q(first_name__icontains=first_name)
-        if last_name:
-            filters |= Q(last_name__icontains=last_name)
+        filters = Q()
 
-        if age:
-            try:
-                age = int(age)
-                today = date.today()
-                dob_start = date(today.year - age - 1, today.month, today.day) + timedelta(days=1)
-                dob_end = date(today.year - age, today.month, today.day)
-                filters &= Q(date_of_birth__range=(dob_start, dob_end))
-            except ValueError:
-                return Response({'error': 'Age must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        if fuzzy == 'phonetic':
+            # Indexed lookups on precomputed Soundex keys (e.g. Jon/John, Smyth/Smith)
+            keys = soundex(first_name), soundex(last_name)
+            if any(name and not key for name, key in zip((first_name, last_name), keys)):
+                # No key to match on; leaving the name out would return every person
+                return Response(
+                    {'error': 'Phonetic search needs names containing letters A-Z'},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            first_name, last_name = keys
+            if first_name:
+                filters |= Q(first_name_phonetic=first_name)
+            if last_name:
+                filters |= Q(last_name_phonetic=last_name)
+        else:
+            if first_name:
+                filters |= Q(first_name__icontains=first_name)
+            if last_name:
+                filters |= Q(last_name__icontains=last_name)
 
-        persons = Person.objects.filter(filters).only("first_name", "last_name", "email", "phone", "date_of_birth")
-        serializer = PersonSearchSerializer(persons, many=True)
+        persons = self.filter_by_age_params(Person.objects.filter(filters))
+        if request.query_params.get("ordering"):
+            persons = self.order_by_params(persons)
+        persons = self.select_serialized_columns(persons, PersonSearchSerializer).with_age()
+        serializer = PersonSearchSerializer(
+            persons, many=True, fields=self.get_sparse_fieldset(PersonSearchSerializer)
+        )
         return Response(serializer.data, status=status.HTTP_200_OK)
 
+    @action(detail=False, methods=["get"], permission_classes=[IsAdminOrGuestUser])
+    def autocomplete(self, request):
+        """
+        Type-ahead suggestions: distinct names whose first or last name starts with `q`, with the
+        number of persons sharing each, served from the in-memory prefix index.
+        """
+        prefix = request.query_params.get("q", "").strip()
+        if not prefix:
+            return Response({"error": "Provide a name prefix"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = int(request.query_params.get("limit", 10))
+        except ValueError:
+            return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= limit <= MAX_SUGGESTIONS:
+            return Response(
+                {"error": f"limit must be between 1 and {MAX_SUGGESTIONS}"}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response(NAME_PREFIX_INDEX.suggest(prefix, limit), status=status.HTTP_200_OK)
+
     @action(detail=False, methods=["get"], permission_classes=[IsAdminOrGuestUser])
     def vector_search(self, request):
         """
-        API to find similar people based on name embeddings.
+        API to find similar people based on name embeddings, most similar first with their `score`.
+
+        `metric` is `l2` (squared distance, lower is closer) or `cosine` (similarity, higher is closer);
+        `threshold` is the maximum distance or minimum similarity and `top_k` caps the results (1-100).
         """
         name = request.query_params.get("name", "").strip()
         if not name:
             return Response({"error": "Provide at least one name"}, status=400)
 
-        persons = find_similar_persons(name)
+        metric = request.query_params.get("metric", "l2")
+        if metric not in SIMILARITY_THRESHOLDS:
+            return Response({"error": f"metric must be one of: {', '.join(SIMILARITY_THRESHOLDS)}"}, status=400)
+        default_threshold, min_threshold, max_threshold = SIMILARITY_THRESHOLDS[metric]
+        try:
+            top_k = int(request.query_params.get("top_k", 5))
+            threshold = float(request.query_params.get("threshold", default_threshold))
+        except ValueError:
+            return Response({"error": "top_k must be an integer and threshold a number"}, status=400)
+        if not 1 <= top_k <= 100 or not min_threshold <= threshold <= max_threshold:
+            return Response(
+                {"error": f"top_k must be between 1 and 100 and threshold between {min_threshold} and {max_threshold}"},
+                status=400,
+            )
+
+        persons = list(
+            find_similar_persons(name, top_k=top_k, threshold=threshold, metric=metric)
+            .only("first_name", "last_name", "email", "phone", "date_of_birth")
+            .with_age()
+        )
 
         if not persons:
             return Response({"message": "No similar persons found"}, status=200)
 
-        serializer = PersonSearchSerializer(persons, many=True)
+        serializer = PersonSimilaritySerializer(persons, many=True)
         return Response(serializer.data, status=200)
+
+    @action(detail=False, methods=["get"], permission_classes=[IsAdminOrGuestUser])
+    def hybrid_search(self, request):
+        """
+        API to rank persons by both name matching and embedding similarity in one call.
+
+        The query embedding is computed on a worker thread while the lexical query runs. Both
+        rankings are merged with weighted reciprocal-rank fusion (`lexical_weight`, `vector_weight`)
+        and the top `limit` persons are fetched in a single query.
+        """
+        name = request.query_params.get("name", "").strip()
+        if not name:
+            return Response({"error": "Provide at least one name"}, status=400)
+
+        try:
+            lexical_weight = float(request.query_params.get("lexical_weight", 1))
+            vector_weight = float(request.query_params.get("vector_weight", 1))
+            limit = int(request.query_params.get("limit", 10))
+        except ValueError:
+            return Response({"error": "Weights must be numbers and limit an integer"}, status=400)
+        if lexical_weight < 0 or vector_weight < 0 or not 1 <= limit <= 100:
+            return Response({"error": "Weights must be >= 0 and limit between 1 and 100"}, status=400)
+
+        depth = limit * 3  # Candidates taken from each source before fusion
+        embedding_future = encode_query_async(name)
+
+        # Lexical ranking: exact name matches before partial ones, more matching tokens first
+        tokens = name.split()[:5]
+        filters = Q()
+        lexical_score = Value(0)
+        for token in tokens:
+            for field in ("first_name", "last_name"):
+                filters |= Q(**{f"{field}__icontains": token})
+                lexical_score += Case(
+                    When(**{f"{field}__iexact": token}, then=Value(2)),
+                    When(**{f"{field}__icontains": token}, then=Value(1)),
+                    default=Value(0),
+                )
+        lexical_ids = list(
+            Person.objects.filter(filters)
+            .annotate(lexical_score=lexical_score)
+            .order_by("-lexical_score", "id")
+            .values_list("id", flat=True)[:depth]
+        )
+
+        embedding_vector = embedding_future.result()
+        vector_matches = [] if embedding_vector is None else search_similar_person_ids(embedding_vector, depth)
+        vector_ids = [person_id for person_id, _ in vector_matches]
+
+        scores = reciprocal_rank_fusion([lexical_ids, vector_ids], [lexical_weight, vector_weight])
+        ranked_ids = sorted(scores, key=lambda person_id: (-scores[person_id], person_id))[:limit]
+        persons = Person.objects.only(
+            "first_name", "last_name", "email", "phone", "date_of_birth"
+        ).with_age().in_bulk(ranked_ids)
+
+        lexical_ranks = {person_id: rank for rank, person_id in enumerate(lexical_ids, start=1)}
+        vector_ranks = {person_id: rank for rank, (person_id, _) in enumerate(vector_matches, start=1)}
+        vector_distances = dict(vector_matches)
+
+        results = []
+        for person_id in ranked_ids:
+            if person_id not in persons:
+                continue  # Deleted since the vector index was built
+            data = PersonSearchSerializer(persons[person_id]).data
+            data["score"] = scores[person_id]
+            data["lexical_rank"] = lexical_ranks.get(person_id)
+            data["vector_rank"] = vector_ranks.get(person_id)
+            data["vector_distance"] = vector_distances.get(person_id)
+            results.append(data)
+        return Response(results, status=200)
+
+    @action(detail=False, methods=["get"])
+    def changes(self, request):
+        """
+        Change feed for incremental sync: persons created/updated and deleted after `cursor`.
+
+        Entries are ordered by (timestamp, kind, id) and paged by keyset, so each call costs in
+        proportion to the changes returned. Pass `next_cursor` back until `has_more` is false.
+        Changes from the last CHANGE_FEED_LAG_SECONDS are held back so rows committed late with an
+        earlier timestamp are not skipped.
+        """
+        try:
+            limit = int(request.query_params.get("limit", 100))
+        except ValueError:
+            return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= limit <= 1000:
+            return Response({"error": "limit must be between 1 and 1000"}, status=status.HTTP_400_BAD_REQUEST)
+
+        persons = Person.objects.with_age().prefetch_related("groups", "user_permissions")
+        tombstones = PersonTombstone.objects.all()
+        cursor = request.query_params.get("cursor")
+        if cursor:
+            try:
+                timestamp, kind, item_id = decode_change_cursor(cursor)
+            except ValueError:
+                return Response({"error": "Invalid cursor"}, status=status.HTTP_400_BAD_REQUEST)
+            # Persons sort before tombstones with the same timestamp
+            if kind == 0:
+                persons = persons.filter(Q(updated_at__gt=timestamp) | Q(updated_at=timestamp, id__gt=item_id))
+                tombstones = tombstones.filter(deleted_at__gte=timestamp)
+            else:
+                persons = persons.filter(updated_at__gt=timestamp)
+                tombstones = tombstones.filter(Q(deleted_at__gt=timestamp) | Q(deleted_at=timestamp, id__gt=item_id))
+
+        horizon = timezone.now() - timedelta(seconds=settings.CHANGE_FEED_LAG_SECONDS)
+        persons = persons.filter(updated_at__lte=horizon).order_by("updated_at", "id")[:limit + 1]
+        tombstones = tombstones.filter(deleted_at__lte=horizon).order_by("deleted_at", "id")[:limit + 1]
+
+        entries = sorted(
+            [(person.updated_at, 0, person.id, person) for person in persons]
+            + [(tombstone.deleted_at, 1, tombstone.id, tombstone) for tombstone in tombstones],
+            key=lambda entry: entry[:3],
+        )
+        has_more = len(entries) > limit
+        entries = entries[:limit]
+
+        results = []
+        for timestamp, kind, item_id, item in entries:
+            if kind == 0:
+                results.append({"type": "upsert", "id": item.id, "person": PersonSerializer(item).data})
+            else:
+                results.append({"type": "delete", "id": item.person_id, "deleted_at": timestamp})
+
+        next_cursor = encode_change_cursor(*entries[-1][:3]) if entries else cursor
+        return Response({"results": results, "next_cursor": next_cursor, "has_more": has_more})
+
+    @action(detail=False, methods=["get"])
+    def duplicates(self, request):
+        """
+        Clusters of likely duplicate persons found by `manage.py find_duplicates` (paginated).
+        """
+        persons = Person.objects.only(
+            "first_name", "last_name", "email", "phone", "date_of_birth"
+        ).with_age().order_by("id")
+        clusters = DuplicateCluster.objects.prefetch_related(Prefetch("persons", queryset=persons)).order_by("id")
+        page = self.paginate_queryset(clusters)
+        serializer = DuplicateClusterSerializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=["get"])
+    def stats(self, request):
+        """
+        Person counts by role, age histogram and signups over the last `days` (default 7), read from
+        counters maintained on every Person change and corrected by `manage.py reconcile_person_stats`.
+        """
+        try:
+            days = int(request.query_params.get("days", 7))
+        except ValueError:
+            return Response({"error": "days must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= days <= settings.PERSON_STATS_SIGNUP_DAYS:
+            return Response(
+                {"error": f"days must be between 1 and {settings.PERSON_STATS_SIGNUP_DAYS}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        return Response(read_person_stats(days), status=status.HTTP_200_OK)